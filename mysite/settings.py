@@ -42,8 +42,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'polls.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'polls.routers.PinPrimaryMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -69,6 +71,25 @@ TEMPLATES = [
     },
 ]
 
+# "production" compiles each template once per process with the cached
+# loader, whatever DEBUG is, and skips the template debug information and
+# the debug context processor. "default" keeps Django's defaults.
+TEMPLATE_PROFILE = config('TEMPLATE_PROFILE', default='default')
+
+if TEMPLATE_PROFILE == 'production':
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS'].update({
+        'debug': False,
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    })
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove(
+        'django.template.context_processors.debug')
+
 WSGI_APPLICATION = 'mysite.wsgi.application'
 
 
@@ -78,10 +99,50 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': config('DB_NAME', default=BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# "production" tunes SQLite for concurrent requests: write-ahead logging,
+# a busy timeout instead of immediate "database is locked" errors, and
+# connections kept open between requests. "default" keeps Django's
+# defaults.
+DB_PROFILE = config('DB_PROFILE', default='default')
+
+# PRAGMAs run on every new SQLite connection (see polls.signals)
+SQLITE_PRAGMAS = {}
+
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'ENGINE': 'mysite.sqlite3',
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Seconds a connection waits for a lock before giving up
+            'timeout': config('DB_BUSY_TIMEOUT', default=20, cast=float),
+            # Take the write lock up front, so writers queue for it
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': config('DB_MMAP_SIZE', default=128 * 1024 * 1024,
+                            cast=int),
+        # Negative sizes are in KiB
+        'cache_size': config('DB_CACHE_SIZE', default=-64000, cast=int),
+        'temp_store': 'MEMORY',
+    }
+
+# Aliases in DATABASES that hold read-only copies of "default", which then
+# serve the polls pages (see mysite/settings_replicas.py for a local setup)
+POLLS_READ_DATABASES = []
+# Seconds a browser keeps reading from "default" after it writes, so users
+# see their own votes before the copies catch up
+POLLS_REPLICA_LAG = config('POLLS_REPLICA_LAG', default=5, cast=int)
+
+DATABASE_ROUTERS = ['polls.routers.PrimaryReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -104,6 +165,78 @@ AUTH_PASSWORD_VALIDATORS = [
 LOGIN_REDIRECT_URL = 'polls:index'
 LOGOUT_REDIRECT_URL = 'login'
 
+# "production" reads sessions from the cache before the database, keeps
+# messages in a cookie instead of the session, and caches logged-in users
+# per process (see polls.auth). "default" keeps Django's defaults.
+SESSION_PROFILE = config('SESSION_PROFILE', default='default')
+
+if SESSION_PROFILE == 'production':
+    # Not signed cookies: the session holds every vote of the user, which
+    # can outgrow a cookie
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+    MIDDLEWARE[MIDDLEWARE.index(
+        'django.contrib.auth.middleware.AuthenticationMiddleware')] = \
+        'polls.auth.CachedAuthenticationMiddleware'
+
+
+# Polls
+
+# Queue votes in memory and write them in batches from a background thread
+POLLS_VOTE_QUEUE = config('POLLS_VOTE_QUEUE', default=False, cast=bool)
+POLLS_VOTE_QUEUE_INTERVAL = config('POLLS_VOTE_QUEUE_INTERVAL', default=0.5,
+                                   cast=float)
+POLLS_VOTE_QUEUE_BATCH_SIZE = config('POLLS_VOTE_QUEUE_BATCH_SIZE',
+                                     default=500, cast=int)
+
+# Most votes accepted in one request to the batch vote endpoint
+POLLS_VOTE_BATCH_SIZE = config('POLLS_VOTE_BATCH_SIZE', default=1000,
+                               cast=int)
+
+# Seconds a process may keep cached poll lists, their ETags and the open
+# poll registry without seeing questions saved by other processes. With a
+# CACHES backend shared by every process (Redis, Memcached), edits through
+# the models are seen at once and this can be 0 (no limit).
+POLLS_INDEX_MAX_AGE = config('POLLS_INDEX_MAX_AGE', default=30, cast=int)
+
+# Split each choice's vote counter over this many rows, picked by voter, so
+# concurrent votes for one choice do not wait on one row lock; 0 keeps a
+# single counter. Results then sum the shards and are cached for
+# POLLS_COUNTER_CACHE_TTL seconds (see the merge_counters command).
+POLLS_COUNTER_SHARDS = config('POLLS_COUNTER_SHARDS', default=0, cast=int)
+POLLS_COUNTER_CACHE_TTL = config('POLLS_COUNTER_CACHE_TTL', default=5,
+                                 cast=int)
+
+# Seconds browsers (and, for results.json, shared caches) may keep the
+# results of a finalized poll; 0 sends no Cache-Control header
+POLLS_SNAPSHOT_MAX_AGE = config('POLLS_SNAPSHOT_MAX_AGE', default=0, cast=int)
+
+# Serve the polls pages with the async views (for ASGI deployments)
+POLLS_ASYNC_VIEWS = config('POLLS_ASYNC_VIEWS', default=False, cast=bool)
+
+# Seconds between keep-alive comments on live results streams
+POLLS_STREAM_KEEPALIVE = config('POLLS_STREAM_KEEPALIVE', default=15,
+                                cast=float)
+# Seconds before a live results stream ends and the browser reconnects
+POLLS_STREAM_LIFETIME = config('POLLS_STREAM_LIFETIME', default=300,
+                               cast=float)
+
+# Hours of votes counted when ranking the most active polls
+POLLS_ACTIVITY_HOURS = config('POLLS_ACTIVITY_HOURS', default=24, cast=int)
+
+# Seconds a logged-in user stays cached, and how many users each process
+# keeps, with SESSION_PROFILE=production
+POLLS_USER_CACHE_TTL = config('POLLS_USER_CACHE_TTL', default=30, cast=float)
+POLLS_USER_CACHE_SIZE = config('POLLS_USER_CACHE_SIZE', default=1000,
+                               cast=int)
+
+# Time every request and its queries (Server-Timing header, /polls/stats/),
+# keeping this many recent requests per URL name
+POLLS_INSTRUMENTATION = config('POLLS_INSTRUMENTATION', default=False,
+                               cast=bool)
+POLLS_INSTRUMENTATION_WINDOW = config('POLLS_INSTRUMENTATION_WINDOW',
+                                      default=1000, cast=int)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
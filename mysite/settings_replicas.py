@@ -0,0 +1,17 @@
+"""
+Settings for trying read replicas locally with two SQLite files.
+
+The polls pages read from db-replica.sqlite3, a copy of db.sqlite3 made
+by ``python manage.py sync_replicas``, which stays stale until the next
+sync. Use with ``--settings=mysite.settings_replicas`` or
+``DJANGO_SETTINGS_MODULE``.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, config
+
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': config('DB_REPLICA_NAME', default=BASE_DIR / 'db-replica.sqlite3'),
+}
+
+POLLS_READ_DATABASES = ['replica']
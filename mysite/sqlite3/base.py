@@ -0,0 +1,26 @@
+"""SQLite backend that can take the write lock when a transaction starts.
+
+With the ``"transaction_mode": "IMMEDIATE"`` option (the name Django 5.1
+gives it), transactions begin with ``BEGIN IMMEDIATE``. A transaction that
+reads and then writes, as saving a vote does, otherwise starts as a reader
+and fails at once with "database is locked" when another connection is
+writing, since SQLite cannot wait out the busy timeout for a lock upgrade.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # Django 5.1 and later pop the option themselves and keep it on
+        # self.transaction_mode.
+        self.transaction_mode = kwargs.pop(
+            'transaction_mode', getattr(self, 'transaction_mode', None))
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f"BEGIN {self.transaction_mode}")
+        else:
+            super()._start_transaction_under_autocommit()
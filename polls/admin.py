@@ -1,6 +1,151 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils.functional import cached_property
 
-from .models import Question, Choice
+from .exports import csv_lines, json_lines, result_rows
+from .models import Question, Choice, ChoiceCounterShard, Vote
 
-admin.site.register(Question)
-admin.site.register(Choice)
+
+def estimate_count(queryset):
+    """
+    The function estimates the number of rows in a model's table without
+    counting them.
+    :return: an integer, or None if the database cannot estimate it.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s",
+                           [table])
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] >= 0 else None
+    if connection.vendor == 'sqlite':
+        # Ids are rarely deleted, so the largest is close to the count.
+        return queryset.model._default_manager.using(queryset.db).aggregate(
+            last=Max('pk'))['last'] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A paginator that estimates the size of a large table instead of
+    counting it, when the changelist is not filtered.
+    """
+    # Tables smaller than this are counted exactly.
+    threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset)
+            if estimate is not None and estimate > self.threshold:
+                return estimate
+        return super().count
+
+
+class ChoiceInline(admin.TabularInline):
+    model = Choice
+    fields = ['choice_text', 'votes']
+    readonly_fields = ['votes']
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_votes()
+
+
+@admin.register(Question)
+class QuestionAdmin(admin.ModelAdmin):
+    list_display = ['question_text', 'pub_date', 'end_date', 'is_published',
+                    'total_votes']
+    list_filter = ['pub_date', 'end_date']
+    search_fields = ['question_text']
+    ordering = ['-pub_date', '-id']
+    inlines = [ChoiceInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['export_results_csv', 'export_results_jsonl']
+
+    def get_queryset(self, request):
+        """
+        Add each question's votes, summed from its choice counters and
+        their counter shards.
+        """
+        shards = (ChoiceCounterShard.objects
+                  .filter(choice__question=OuterRef('pk'))
+                  .values('choice__question').annotate(total=Sum('count'))
+                  .values('total'))
+        return super().get_queryset(request).annotate(
+            total_votes=Coalesce(Sum('choice__vote_count'), 0)
+            + Coalesce(Subquery(shards), 0))
+
+    @admin.display(description="Votes", ordering='total_votes')
+    def total_votes(self, question):
+        return question.total_votes or 0
+
+    @admin.action(description="Export results of selected questions as CSV")
+    def export_results_csv(self, request, queryset):
+        return StreamingHttpResponse(
+            csv_lines(result_rows(queryset)), content_type='text/csv',
+            headers={'Content-Disposition':
+                     'attachment; filename="poll-results.csv"'})
+
+    @admin.action(
+        description="Export results of selected questions as JSON lines")
+    def export_results_jsonl(self, request, queryset):
+        return StreamingHttpResponse(
+            json_lines(result_rows(queryset)),
+            content_type='application/x-ndjson',
+            headers={'Content-Disposition':
+                     'attachment; filename="poll-results.jsonl"'})
+
+
+@admin.register(Choice)
+class ChoiceAdmin(admin.ModelAdmin):
+    list_display = ['choice_text', 'question', 'total_votes']
+    list_select_related = ['question']
+    search_fields = ['choice_text']
+    autocomplete_fields = ['question']
+    exclude = ['vote_count']
+    readonly_fields = ['votes']
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        """Add each choice's votes, including its counter shards."""
+        return super().get_queryset(request).with_votes()
+
+    @admin.display(description="Votes", ordering='current_votes')
+    def total_votes(self, choice):
+        return choice.current_votes
+
+
+@admin.register(Vote)
+class VoteAdmin(admin.ModelAdmin):
+    """
+    A read-only list of votes, newest first. Votes are only changed
+    through the vote view, which keeps the counters in step.
+    """
+    list_display = ['id', 'user', 'question', 'choice', 'created_at']
+    list_select_related = ['user', 'question', 'choice']
+    raw_id_fields = ['user', 'question', 'choice']
+    ordering = ['-id']
+    # Sorting by any other column would scan the whole table.
+    sortable_by = ['id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,152 @@
+"""Async versions of the polls views, mounted when ``POLLS_ASYNC_VIEWS`` is on.
+
+They read the database with Django's async ORM, so under ASGI a page
+needs no thread hop for its own queries. Loading the user and session,
+and the transaction that saves a vote, still run in one `sync_to_async`
+call each, since Django's auth and transactions are sync-only.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.views import View
+
+from .caching import (aindex_last_modified, arender_question_list,
+                      index_version, question_list_context)
+from .ingest import get_vote_queue
+from .models import Question, Vote
+from .pagination import KeysetPage, SinglePage
+from .registry import open_polls
+from .user_votes import get_user_votes, remember_vote
+from .views import cache_frozen, conditional_get, make_etag, most_active
+
+
+async def aload_user(request):
+    """
+    The function loads the user, the session and the user's votes in one
+    thread hop, so that the view can use them afterwards without queries.
+    :return: a list of the ids of the questions the user voted on.
+    """
+    return await sync_to_async(lambda: list(get_user_votes(request)))()
+
+
+class IndexView(View):
+    """Async version of `polls.views.IndexView`."""
+    template_name = 'polls/index.html'
+    page_size = 20
+
+    async def get(self, request, *args, **kwargs):
+        now = timezone.now()
+        user_votes = await aload_user(request)
+        if request.GET.get('order') == 'active':
+            page = SinglePage([question async for question
+                               in most_active(now)[:self.page_size]])
+            return render(request, self.template_name, {
+                'latest_question_list': page.object_list,
+                'page': page,
+                'order': 'active',
+                'question_list': render_to_string(
+                    'polls/question_list.html',
+                    question_list_context(page)),
+                'user_votes': user_votes,
+            })
+        cursor = request.GET.get('before')
+        last_modified = await aindex_last_modified(now)
+        etag = make_etag(index_version(), last_modified, cursor,
+                         request.user.get_username(), sorted(user_votes))
+        page = KeysetPage(Question.objects.published(now).with_status(now),
+                          self.page_size, cursor)
+        question_list = await arender_question_list(page, now, cursor)
+        return conditional_get(
+            request,
+            lambda: render(request, self.template_name, {
+                'latest_question_list': page.queryset[:self.page_size],
+                'page': page,
+                'question_list': question_list,
+                'user_votes': user_votes,
+            }),
+            etag, last_modified)
+
+
+class DetailView(View):
+    """Async version of `polls.views.DetailView`."""
+    template_name = 'polls/detail.html'
+
+    async def get(self, request, pk, *args, **kwargs):
+        await aload_user(request)
+        question = await open_polls.aget(pk)
+        if question is None:
+            question = await Question.objects.published().filter(
+                pk=pk).afirst()
+            if question is None:
+                messages.error(request, f"Poll with ID {pk} is not found.")
+                return redirect("polls:index")
+            messages.error(request,
+                           f"The poll '{question}' "
+                           f"has concluded and voting is closed.")
+            return redirect("polls:index")
+        return render(request, self.template_name, {
+            'question': question,
+            'choices': question.open_choices,
+            'user_vote': get_user_votes(request).get(str(question.pk)),
+        })
+
+
+class ResultsView(View):
+    """Async version of `polls.views.ResultsView`."""
+    template_name = 'polls/results.html'
+
+    async def get(self, request, pk, *args, **kwargs):
+        await aload_user(request)
+        question = await Question.objects.select_related(
+            'resultsnapshot').filter(pk=pk).afirst()
+        if question is None:
+            raise Http404("No question matches the given query.")
+        frozen = question.frozen_results()
+        results = frozen or await question.aresults()
+        is_future_question = not question.can_vote()
+
+        def render_page():
+            if is_future_question:
+                messages.error(request, "That poll is not available to vote.")
+            return render(request, self.template_name,
+                          {"question": question,
+                           "results": results,
+                           "is_future_question": is_future_question})
+
+        etag = make_etag(results, is_future_question,
+                         request.user.get_username())
+        response = conditional_get(request, render_page, etag)
+        return cache_frozen(response) if frozen else response
+
+
+async def vote(request, question_id):
+    """Async version of `polls.views.vote`."""
+    await aload_user(request)
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    question = await open_polls.aget(question_id)
+    if question is None:
+        if not await Question.objects.filter(pk=question_id).aexists():
+            raise Http404("No question matches the given query.")
+        return redirect("login")
+    selected_choice = open_polls.choice(question, request.POST.get('choice'))
+    if selected_choice is None:
+        messages.error(request, "Please select a choice!")
+        return redirect("polls:detail", pk=question.id)
+    if settings.POLLS_VOTE_QUEUE:
+        get_vote_queue().submit(request.user.pk, question.pk,
+                                selected_choice.pk)
+    else:
+        await sync_to_async(Vote.objects.record)(request.user,
+                                                 selected_choice)
+    remember_vote(request, question.pk, selected_choice.pk)
+    messages.success(request, f'Your vote for '
+                              f'{selected_choice.choice_text} has been saved.')
+    return HttpResponseRedirect(reverse(
+        'polls:results', args=(question.id,)))
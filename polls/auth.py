@@ -0,0 +1,97 @@
+"""A per-process cache of logged-in users, for ``SESSION_PROFILE=production``.
+
+Django's `AuthenticationMiddleware` loads the user from the database on
+every request that reads ``request.user``. `CachedAuthenticationMiddleware`
+keeps the users of recent sessions in a small LRU instead, keyed by the
+session and its auth hash, for ``POLLS_USER_CACHE_TTL`` seconds. Saving or
+deleting a user drops it from this process's cache; other processes see
+the change when their entry expires.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+
+
+class UserCache:
+    """A thread-safe LRU of users whose entries expire."""
+
+    def __init__(self):
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        The function returns a cached user.
+        :return: a copy of the user, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._users.get(key)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic():
+                del self._users[key]
+                return None
+            self._users.move_to_end(key)
+        return copy.copy(user)
+
+    def set(self, key, user):
+        with self._lock:
+            self._users[key] = (
+                time.monotonic() + settings.POLLS_USER_CACHE_TTL, user)
+            self._users.move_to_end(key)
+            while len(self._users) > settings.POLLS_USER_CACHE_SIZE:
+                self._users.popitem(last=False)
+
+    def discard(self, user_id):
+        """
+        The function drops every cached session of a user.
+        """
+        user_id = str(user_id)
+        with self._lock:
+            for key in [key for key in self._users if key[1] == user_id]:
+                del self._users[key]
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+def get_cached_user(request):
+    """
+    The function returns the user of the request's session, from the cache
+    when the same session was seen recently.
+    :return: a user, or an `AnonymousUser`.
+    """
+    session = request.session
+    user_id = session.get(auth.SESSION_KEY)
+    if user_id is None:
+        return auth.get_user(request)
+    key = (session.session_key, str(user_id),
+           session.get(auth.HASH_SESSION_KEY))
+    user = user_cache.get(key)
+    if user is None:
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            user_cache.set(key, user)
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    Sets ``request.user`` like `AuthenticationMiddleware`, through the
+    per-process `user_cache`.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
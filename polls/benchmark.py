@@ -0,0 +1,383 @@
+"""Helpers for the ``benchmark`` management command.
+
+Benchmarks run against a throwaway test database, seeded with synthetic
+users, questions, choices and votes, and drive the views in-process
+through Django's test clients: `Client` goes through the WSGI handler and
+`AsyncClient` through the ASGI handler. Each run reports throughput,
+latency percentiles and the queries made per request, and can be checked
+against a saved baseline. `WriteTimer` also adds up the time spent
+writing, lock waits included. `time_renders` times the polls templates on
+their own, without the views around them.
+"""
+import asyncio
+import contextlib
+import datetime
+import random
+import statistics
+import threading
+import time
+from types import ModuleType
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, connections
+from django.db.backends.signals import connection_created
+from django.template import engines
+from django.template.loader import get_template, render_to_string
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+from django.urls import include, path
+from django.utils import timezone
+
+from .caching import invalidate_index, question_list_context
+from .models import Question, Choice, Vote, VoteRollup
+from .pagination import SinglePage
+from .urls import build_urlpatterns
+
+
+@contextlib.contextmanager
+def benchmark_database(path=None):
+    """
+    The function creates an empty test database for the benchmark and
+    destroys it afterwards, leaving the real database untouched.
+
+    :param path: A file for an SQLite test database, which is otherwise
+        kept in memory. Locking and journaling only behave as in
+        production with a file.
+    """
+    if path is not None:
+        connection.settings_dict['TEST']['NAME'] = str(path)
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0,
+                                                  autoclobber=True,
+                                                  serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed(users, questions, choices, votes):
+    """
+    The function fills the database with synthetic polls.
+
+    :param users: The number of users.
+    :param questions: The number of open questions.
+    :param choices: The number of choices per question.
+    :param votes: The number of votes, at most one per user and question.
+    :return: a list of the created questions.
+    """
+    now = timezone.now()
+    User.objects.bulk_create(User(username=f"bench{n}")
+                             for n in range(users))
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    Question.objects.bulk_create(
+        Question(question_text=f"Benchmark question {n}",
+                 pub_date=now - datetime.timedelta(minutes=n))
+        for n in range(questions))
+    created = list(Question.objects.all())
+    Choice.objects.bulk_create(
+        Choice(question=question, choice_text=f"Choice {n}")
+        for question in created for n in range(choices))
+    choice_ids = {}
+    for question_id, choice_id in Choice.objects.values_list('question',
+                                                             'pk'):
+        choice_ids.setdefault(question_id, []).append(choice_id)
+    pairs = random.sample(
+        [(user_id, question_id) for user_id in user_ids
+         for question_id in choice_ids],
+        min(votes, len(user_ids) * len(choice_ids)))
+    Vote.objects.bulk_create(
+        (Vote(user_id=user_id, question_id=question_id,
+              choice_id=random.choice(choice_ids[question_id]))
+         for user_id, question_id in pairs), batch_size=1000)
+    Choice.objects.rebuild_vote_counts()
+    VoteRollup.objects.rebuild()
+    invalidate_index()
+    return created
+
+
+def mounted(pages):
+    """
+    The function mounts the polls views from a module as the whole site.
+
+    :param pages: `polls.views` or `polls.async_views`.
+    :return: a context manager that overrides ``ROOT_URLCONF``.
+    """
+    urlconf = ModuleType(f'{pages.__name__}_benchmark_urls')
+    urlconf.urlpatterns = [
+        path('polls/', include((build_urlpatterns(pages), 'polls'))),
+        path('accounts/', include('django.contrib.auth.urls')),
+    ]
+    return override_settings(ROOT_URLCONF=urlconf)
+
+
+class QueryCounter:
+    """
+    Counts the queries of every database connection, including those the
+    async views open in worker threads.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._install(connection)
+        connection_created.connect(self._install)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection_created.disconnect(self._install)
+        with self._lock:
+            installed, self._connections = self._connections, []
+        for wrapped in installed:
+            if self in wrapped.execute_wrappers:
+                wrapped.execute_wrappers.remove(self)
+
+    def _install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+            with self._lock:
+                self._connections.append(connection)
+
+
+class WriteTimer(QueryCounter):
+    """
+    Counts queries like `QueryCounter`, and adds up the seconds spent in
+    the statements that write or begin a transaction. Those include
+    waiting for the locks the writes need, so with many writers the total
+    approximates the time lost to lock contention.
+    """
+    WRITES = ('BEGIN', 'INSERT', 'UPDATE', 'DELETE')
+
+    def __init__(self):
+        super().__init__()
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(self.WRITES):
+            return super().__call__(execute, sql, params, many, context)
+        begin = time.perf_counter()
+        try:
+            return super().__call__(execute, sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - begin
+            with self._lock:
+                self.seconds += elapsed
+
+
+def summarize(latencies, elapsed, queries=0):
+    """
+    The function summarizes request latencies.
+
+    :param latencies: Seconds taken by each request.
+    :param elapsed: Seconds taken by the whole run.
+    :param queries: Queries made by the whole run.
+    :return: a dict of throughput, latency percentiles in milliseconds and
+        queries per request.
+    """
+    ordered = sorted(latencies) or [0.0]
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'queries': queries / len(latencies) if latencies else 0.0,
+    }
+
+
+def run_sync(client, requests, counter):
+    """
+    The function sends each request in turn with a sync test client.
+
+    :param requests: (path, data) pairs, sent as GET when data is None and
+        as POST otherwise.
+    :param counter: The `QueryCounter` in use.
+    :return: the summary from `summarize`.
+    """
+    latencies = []
+    queries = counter.count
+    started = time.perf_counter()
+    for url, data in requests:
+        begin = time.perf_counter()
+        if data is None:
+            client.get(url)
+        else:
+            client.post(url, data)
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - started,
+                     counter.count - queries)
+
+
+def run_async(client, requests, counter, concurrency=1):
+    """
+    The function sends the requests with an async test client, keeping up
+    to `concurrency` of them in flight.
+    :return: the summary from `summarize`.
+    """
+    async def timed(url, data, limit, latencies):
+        async with limit:
+            begin = time.perf_counter()
+            if data is None:
+                await client.get(url)
+            else:
+                await client.post(url, data)
+            latencies.append(time.perf_counter() - begin)
+
+    async def main():
+        limit = asyncio.Semaphore(concurrency)
+        latencies = []
+        queries = counter.count
+        started = time.perf_counter()
+        await asyncio.gather(*(timed(url, data, limit, latencies)
+                               for url, data in requests))
+        return summarize(latencies, time.perf_counter() - started,
+                         counter.count - queries)
+
+    return asyncio.run(main())
+
+
+def run_threaded(clients, requests):
+    """
+    The function POSTs from several clients at once, one thread each, the
+    way concurrent users of a threaded server would.
+
+    :param clients: Test clients, each already logged in.
+    :param requests: For each client, a list of (path, data) pairs.
+    :return: the summary from `summarize`, with the number of requests
+        that failed with a database error as ``errors``.
+    """
+    ready = threading.Barrier(len(clients) + 1)
+    latencies, errors = [], []
+
+    def work(client, batch):
+        ready.wait()
+        try:
+            for url, data in batch:
+                begin = time.perf_counter()
+                try:
+                    client.post(url, data)
+                except OperationalError as error:
+                    errors.append(error)
+                else:
+                    latencies.append(time.perf_counter() - begin)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=work, args=(client, batch))
+               for client, batch in zip(clients, requests)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    stats = summarize(latencies, time.perf_counter() - started)
+    stats['errors'] = len(errors)
+    return stats
+
+
+def template_contexts(now):
+    """
+    The function builds the contexts the views render the polls templates
+    with, from the questions in the database.
+
+    :param now: The time the question list is built for.
+    :return: a dict of template names and their contexts.
+    """
+    page = SinglePage(list(Question.objects.published(now)
+                           .with_status(now)[:20]))
+    question = page.object_list[0]
+    return {
+        'polls/question_list.html': question_list_context(page),
+        'polls/index.html': {
+            'question_list': render_to_string('polls/question_list.html',
+                                              question_list_context(page)),
+            'user_votes': [],
+        },
+        'polls/detail.html': {'question': question,
+                              'choices': list(question.choice_set.all()),
+                              'user_vote': None},
+        'polls/results.html': {'question': question,
+                               'results': question.results()},
+    }
+
+
+def reset_template_loaders():
+    """
+    The function empties the cached template loaders, so the next render
+    loads and compiles its template again.
+    """
+    for engine in engines.all():
+        for loader in getattr(engine, 'engine', engine).template_loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
+
+
+def time_renders(template_name, context, request, renders):
+    """
+    The function times loading and rendering a template, first from an
+    empty template cache and then repeatedly.
+
+    :param context: The context to render with.
+    :param request: The request the context processors read.
+    :param renders: The number of timed renders after the first.
+    :return: a `summarize` dict, with the first render's time as
+        ``first_ms`` and the queries made while rendering.
+    """
+    reset_template_loaders()
+    begin = time.perf_counter()
+    get_template(template_name).render(context, request)
+    first = time.perf_counter() - begin
+    latencies = []
+    with QueryCounter() as counter:
+        started = time.perf_counter()
+        for _ in range(renders):
+            begin = time.perf_counter()
+            get_template(template_name).render(context, request)
+            latencies.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - started
+    stats = summarize(latencies, elapsed, counter.count)
+    stats['first_ms'] = first * 1000
+    return stats
+
+
+def compare(results, baseline, tolerance):
+    """
+    The function finds the endpoints that got slower than the baseline.
+
+    :param results: Summaries of this run, keyed by "handler endpoint".
+    :param baseline: Summaries of an earlier run, in the same form.
+    :param tolerance: The fraction by which throughput may fall and the
+        95th percentile latency may rise before it counts as a regression.
+        Queries per request may rise by at most half a query.
+    :return: a list of messages, one per regression.
+    """
+    regressions = []
+    for key, old in baseline.items():
+        new = results.get(key)
+        if new is None:
+            continue
+        if new['rps'] < old['rps'] * (1 - tolerance):
+            regressions.append(f"{key}: {new['rps']:.1f} req/s, "
+                               f"baseline {old['rps']:.1f}")
+        if new['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {new['p95_ms']:.2f} ms, "
+                               f"baseline {old['p95_ms']:.2f}")
+        if new['queries'] > old['queries'] + 0.5:
+            regressions.append(f"{key}: {new['queries']:.2f} queries per "
+                               f"request, baseline {old['queries']:.2f}")
+    return regressions
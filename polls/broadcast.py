@@ -0,0 +1,70 @@
+"""In-process fan-out of result updates to Server-Sent Events streams.
+
+Each open results stream subscribes to its question with an asyncio
+queue. When votes change, the results are computed once and handed to
+every subscriber's event loop, so N watchers cost one aggregation per
+change rather than N page reloads. No external broker is needed, but
+only streams served by the same process see the update.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+
+class ResultsBroadcaster:
+    """
+    Subscribers per question, each an asyncio queue bound to its loop.
+
+    Queues hold only the latest results: a slow client skips straight to
+    the newest counts instead of replaying every change.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, question_id):
+        """
+        The function registers a new subscriber on the running event loop.
+        :return: an asyncio queue that receives the question's results.
+        """
+        queue = asyncio.Queue(maxsize=1)
+        with self._lock:
+            self._subscribers[question_id].add(
+                (asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, question_id, queue):
+        """
+        The function removes a subscriber added by `subscribe`.
+        """
+        with self._lock:
+            subscribers = self._subscribers[question_id]
+            subscribers.difference_update(
+                {item for item in subscribers if item[1] is queue})
+            if not subscribers:
+                del self._subscribers[question_id]
+
+    def has_subscribers(self, question_id):
+        with self._lock:
+            return question_id in self._subscribers
+
+    def publish(self, question_id, results):
+        """
+        The function sends results to every subscriber of a question. It
+        may be called from any thread.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(question_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_replace, queue, results)
+
+
+def _replace(queue, item):
+    """Put an item on a one-slot queue, dropping what it held."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+broadcaster = ResultsBroadcaster()
@@ -0,0 +1,149 @@
+"""Caching of the rendered poll list.
+
+The poll list only changes when a question opens or closes, or when a
+question is edited. A rendered list is therefore cached until the next
+`pub_date`/`end_date` boundary, under a version number that is bumped
+whenever a question is saved or deleted. When the list is read from a
+copy of the database, it is kept no longer than the copy may lag behind.
+
+The version lives in ``CACHES``. Unless that is a backend shared by every
+process, such as Redis or Memcached, a process does not see the versions
+bumped by others, so the version itself expires after
+``POLLS_INDEX_MAX_AGE`` seconds and changes saved elsewhere show up within
+that time.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Question
+
+INDEX_VERSION_KEY = 'polls:index-version'
+_MISSING = object()
+# An id no question has, reversed in place of the real ones
+_ID_PLACEHOLDER = '2147483647'
+
+
+def index_version():
+    """
+    The function returns the current version of the cached poll list.
+    :return: an integer value.
+    """
+    return cache.get_or_set(INDEX_VERSION_KEY, time.time_ns, _max_age())
+
+
+def invalidate_index():
+    """
+    The function makes every cached poll list stale.
+    """
+    try:
+        cache.incr(INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(INDEX_VERSION_KEY, time.time_ns(), _max_age())
+
+
+def _max_age():
+    return settings.POLLS_INDEX_MAX_AGE or None
+
+
+def _timeout_until(boundary):
+    """
+    The function returns how long a cached poll list stays valid.
+    :param boundary: The next time a question opens or closes, or None.
+    :return: a number of seconds, or None if it never changes by itself
+        and ``POLLS_INDEX_MAX_AGE`` is 0.
+    """
+    timeout = None
+    if boundary is not None:
+        timeout = max(1, int((boundary - timezone.now()).total_seconds()) + 1)
+    for limit in (_max_age(), settings.POLLS_READ_DATABASES
+                  and settings.POLLS_REPLICA_LAG):
+        if limit:
+            timeout = min(timeout or limit, limit)
+    return timeout
+
+
+def index_last_modified(now):
+    """
+    The function returns when the poll list last changed by a question
+    opening or closing, cached until the next such change.
+    :param now: The time the poll list is built for.
+    :return: a datetime, or None if no question is published.
+    """
+    cache_key = f'polls:index-modified:{index_version()}'
+    last_modified = cache.get(cache_key, _MISSING)
+    if last_modified is _MISSING:
+        last_modified = Question.objects.last_boundary(now)
+        cache.set(cache_key, last_modified,
+                  _timeout_until(Question.objects.next_boundary(now)))
+    return last_modified
+
+
+async def aindex_last_modified(now):
+    """Async version of `index_last_modified`."""
+    cache_key = f'polls:index-modified:{index_version()}'
+    last_modified = cache.get(cache_key, _MISSING)
+    if last_modified is _MISSING:
+        last_modified = await Question.objects.alast_boundary(now)
+        cache.set(cache_key, last_modified,
+                  _timeout_until(await Question.objects.anext_boundary(now)))
+    return last_modified
+
+
+def question_list_context(page):
+    """
+    The function builds the context of the question list template. Each
+    question's vote and results links are filled into URLs reversed once
+    for the whole page, which is much cheaper than a ``{% url %}`` per row.
+
+    :param page: A page of questions annotated with `is_open`.
+    :return: a dict of the page and a row for each of its questions.
+    """
+    detail_url = reverse('polls:detail', args=(_ID_PLACEHOLDER,))
+    results_url = reverse('polls:results', args=(_ID_PLACEHOLDER,))
+    rows = [{'question': question,
+             'detail_url': detail_url.replace(_ID_PLACEHOLDER,
+                                              str(question.pk)),
+             'results_url': results_url.replace(_ID_PLACEHOLDER,
+                                                str(question.pk))}
+            for question in page.object_list]
+    return {'page': page, 'rows': rows}
+
+
+def render_question_list(page, now, cursor=None):
+    """
+    The function renders a page of the question list, or returns it from
+    the cache if no question has opened, closed or changed since it was
+    rendered.
+
+    :param page: A `KeysetPage` of questions annotated with `is_open`,
+        only evaluated when the page is not in the cache.
+    :param now: The time the queryset was built for.
+    :param cursor: The cursor the page starts after, if any.
+    :return: the rendered HTML.
+    """
+    cache_key = f'polls:index:{index_version()}:{cursor or ""}'
+    html = cache.get(cache_key)
+    if html is None:
+        html = render_to_string('polls/question_list.html',
+                                question_list_context(page))
+        cache.set(cache_key, html,
+                  _timeout_until(Question.objects.next_boundary(now)))
+    return html
+
+
+async def arender_question_list(page, now, cursor=None):
+    """Async version of `render_question_list`."""
+    cache_key = f'polls:index:{index_version()}:{cursor or ""}'
+    html = cache.get(cache_key)
+    if html is None:
+        await page.aload()
+        html = render_to_string('polls/question_list.html',
+                                question_list_context(page))
+        cache.set(cache_key, html,
+                  _timeout_until(await Question.objects.anext_boundary(now)))
+    return html
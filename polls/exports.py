@@ -0,0 +1,112 @@
+"""Bulk export of every question's results for analytics.
+
+All the tallies come from one query over the choices, joined to their
+question. The per-choice vote counters, with their counter shards,
+already hold the aggregate, and the question's total is a window sum
+over them, so the export never reads the Vote table and its cost grows
+with the number of choices only. Rows are read with a server-side
+iterator and written as they arrive, so memory stays flat.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Sum, Window
+
+from .models import Choice
+
+FIELDS = ['question_id', 'question_text', 'pub_date', 'end_date',
+          'choice_id', 'choice_text', 'votes', 'question_total']
+
+
+def result_rows(questions=None, chunk_size=2000):
+    """
+    The function reads the results of every choice, ordered by question.
+
+    :param questions: A queryset of the questions to export, or None for all.
+    :param chunk_size: Rows fetched from the database at a time.
+    :return: an iterator of tuples in the order of `FIELDS`.
+    """
+    choices = Choice.objects.with_votes()
+    if questions is not None:
+        choices = choices.filter(question__in=questions)
+    return (choices.order_by('question_id', 'pk')
+            .values_list('question_id', 'question__question_text',
+                         'question__pub_date', 'question__end_date',
+                         'pk', 'choice_text', 'current_votes',
+                         Window(Sum('current_votes'),
+                                partition_by=[F('question_id')]))
+            .iterator(chunk_size=chunk_size))
+
+
+class _Echo:
+    """A file-like object that returns what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    """
+    The function formats result rows as CSV, one line at a time.
+    :return: an iterator of strings, starting with the header line.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow(
+            [value.isoformat() if hasattr(value, 'isoformat') else value
+             for value in row])
+
+
+def json_lines(rows):
+    """
+    The function formats result rows as JSON lines.
+    :return: an iterator of strings, one JSON object per line.
+    """
+    for row in rows:
+        yield json.dumps(dict(zip(FIELDS, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def write_parquet(rows, path, batch_size=10000):
+    """
+    The function writes result rows to a Parquet file, one row group per
+    `batch_size` rows. It needs the optional ``pyarrow`` package.
+
+    :param rows: Tuples in the order of `FIELDS`.
+    :param path: The file to write.
+    :param batch_size: Rows held in memory at a time.
+    :return: the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('question_id', pa.int64()),
+        ('question_text', pa.string()),
+        ('pub_date', pa.timestamp('us', tz='UTC')),
+        ('end_date', pa.timestamp('us', tz='UTC')),
+        ('choice_id', pa.int64()),
+        ('choice_text', pa.string()),
+        ('votes', pa.int64()),
+        ('question_total', pa.int64()),
+    ])
+    written = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                written += _write_batch(writer, schema, batch)
+                batch = []
+        if batch:
+            written += _write_batch(writer, schema, batch)
+    return written
+
+
+def _write_batch(writer, schema, batch):
+    import pyarrow as pa
+
+    columns = [list(column) for column in zip(*batch)]
+    writer.write_batch(pa.record_batch(columns, schema=schema))
+    return len(batch)
@@ -0,0 +1,113 @@
+"""Write-behind ingestion of votes.
+
+When ``POLLS_VOTE_QUEUE`` is on, `vote()` hands validated votes to a
+process-local queue instead of writing them itself. A background thread
+flushes the queue every ``POLLS_VOTE_QUEUE_INTERVAL`` seconds, or as soon
+as ``POLLS_VOTE_QUEUE_BATCH_SIZE`` votes are waiting, writing each batch
+with `Vote.objects.record_many` in one transaction.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Vote
+
+logger = logging.getLogger(__name__)
+
+
+class VoteQueue:
+    """
+    A queue of votes waiting to be written, keeping only the last choice
+    of each user for each question.
+    """
+
+    def __init__(self, interval, batch_size, autostart=True):
+        """
+        :param interval: Seconds between flushes.
+        :param batch_size: Most votes written in one transaction.
+        :param autostart: Whether to start the flusher thread on the first
+            submitted vote.
+        """
+        self.interval = interval
+        self.batch_size = batch_size
+        self.autostart = autostart
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def submit(self, user_id, question_id, choice_id):
+        """
+        The function queues a vote, replacing any vote of the same user for
+        the same question that has not been written yet.
+        """
+        with self._lock:
+            key = (user_id, question_id)
+            self._pending.pop(key, None)
+            self._pending[key] = choice_id
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+            if self.autostart and self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="vote-queue", daemon=True)
+                self._thread.start()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        The function writes every queued vote, one batch per transaction.
+        """
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    keys = list(self._pending)[:self.batch_size]
+                    if not keys:
+                        return
+                    batch = [(user_id, question_id,
+                              self._pending.pop((user_id, question_id)))
+                             for user_id, question_id in keys]
+                try:
+                    Vote.objects.record_many(batch)
+                except Exception:
+                    # Write the votes one at a time so a single bad vote
+                    # (say, for a deleted choice) cannot sink the others.
+                    for ballot in batch:
+                        try:
+                            Vote.objects.record_many([ballot])
+                        except Exception:
+                            logger.exception("Dropped queued vote %s",
+                                             ballot)
+
+    def _run(self):
+        """Flush the queue until the process exits."""
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_vote_queue():
+    """
+    The function returns the process-wide vote queue, creating it from the
+    settings on first use.
+    :return: a `VoteQueue` object.
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = VoteQueue(settings.POLLS_VOTE_QUEUE_INTERVAL,
+                               settings.POLLS_VOTE_QUEUE_BATCH_SIZE)
+            atexit.register(_queue.flush)
+        return _queue
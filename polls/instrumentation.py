@@ -0,0 +1,245 @@
+"""Per-request timing and SQL instrumentation, on when
+``POLLS_INSTRUMENTATION`` is set.
+
+`InstrumentationMiddleware` measures each request's wall time, template
+render time, query count, database time and repeated queries, sends them
+to the browser in a ``Server-Timing`` header, and keeps the last
+``POLLS_INSTRUMENTATION_WINDOW`` requests of every URL name in memory for
+the staff stats page. When the setting is off the middleware removes
+itself from the stack at startup, so it costs nothing.
+
+The measurements of the current request live in a context variable,
+which `sync_to_async` carries into the threads that run the async views'
+queries.
+"""
+import contextvars
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+_current = contextvars.ContextVar('polls_request_stats', default=None)
+
+# Upper bounds in milliseconds of the histogram buckets.
+BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, float('inf')]
+
+
+def fingerprint(sql):
+    """
+    The function reduces a query to its shape, so that the same query run
+    with different parameters or list lengths has the same fingerprint.
+    """
+    sql = ' '.join(sql.split())
+    return re.sub(r'\(\s*%s(?:\s*,\s*%s)*\s*\)', '(...)', sql)
+
+
+class RequestStats:
+    """What one request spent its time on."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.rendering = False
+        self.fingerprints = Counter()
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """A dict of the fingerprints of queries run more than once."""
+        return {sql: count for sql, count in self.fingerprints.items()
+                if count > 1}
+
+    def server_timing(self):
+        """
+        The function formats the stats as a ``Server-Timing`` header.
+        :return: a header value.
+        """
+        duplicates = sum(count - 1 for count in self.duplicates.values())
+        return (f'total;dur={self.total * 1000:.1f}, '
+                f'db;dur={self.db_time * 1000:.1f};'
+                f'desc="{self.queries} queries, {duplicates} duplicate", '
+                f'tpl;dur={self.render_time * 1000:.1f}')
+
+
+class Histogram:
+    """The stats of the most recent requests to one URL name."""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.duplicates = Counter()
+
+    def add(self, stats):
+        self.samples.append((stats.total, stats.queries, stats.db_time,
+                             stats.render_time))
+        self.duplicates.update(stats.duplicates)
+        if len(self.duplicates) > 100:
+            self.duplicates = Counter(dict(self.duplicates.most_common(50)))
+
+    def summary(self):
+        """
+        The function summarizes the recent requests.
+        :return: a dict of latency percentiles and means in milliseconds,
+            mean queries, bucket counts and the most repeated queries.
+        """
+        samples = list(self.samples)
+        count = len(samples)
+        totals = sorted(sample[0] * 1000 for sample in samples)
+
+        def percentile(p):
+            return totals[min(count - 1, int(count * p))]
+
+        def mean(index, scale=1000):
+            return sum(sample[index] for sample in samples) * scale / count
+
+        buckets = [0] * len(BUCKETS)
+        for total in totals:
+            buckets[next(n for n, bound in enumerate(BUCKETS)
+                         if total <= bound)] += 1
+        return {
+            'count': count,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'queries': mean(1, scale=1),
+            'db_ms': mean(2),
+            'render_ms': mean(3),
+            'buckets': [(f'<= {bound:g} ms' if bound != float('inf')
+                         else f'> {BUCKETS[-2]:g} ms', requests)
+                        for bound, requests in zip(BUCKETS, buckets)],
+            'duplicates': self.duplicates.most_common(5),
+        }
+
+
+class Timings:
+    """The histograms of every URL name, safe to share between threads."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def add(self, url_name, stats):
+        with self._lock:
+            histogram = self._histograms.get(url_name)
+            if histogram is None:
+                histogram = self._histograms[url_name] = Histogram(
+                    settings.POLLS_INSTRUMENTATION_WINDOW)
+            histogram.add(stats)
+
+    def summaries(self):
+        """:return: a dict of URL names and their `Histogram.summary`."""
+        with self._lock:
+            return {url_name: histogram.summary() for url_name, histogram
+                    in sorted(self._histograms.items())}
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+timings = Timings()
+
+
+def record_query(execute, sql, params, many, context):
+    """Time a query into the current request's stats, if any."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    begin = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - begin)
+
+
+def _add_query_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+_render = Template.render
+
+
+def _timed_render(self, context=None, request=None):
+    """Time the outermost template render into the current stats."""
+    stats = _current.get()
+    if stats is None or stats.rendering:
+        return _render(self, context, request)
+    stats.rendering = True
+    begin = time.perf_counter()
+    try:
+        return _render(self, context, request)
+    finally:
+        stats.rendering = False
+        stats.render_time += time.perf_counter() - begin
+
+
+def install():
+    """
+    The function hooks the query and template timers into Django. Until
+    it is called, nothing is measured. The query timer is added to this
+    thread's connection and to every connection opened afterwards.
+    """
+    _add_query_wrapper(connection)
+    connection_created.connect(_add_query_wrapper)
+    Template.render = _timed_render
+
+
+class InstrumentationMiddleware:
+    """
+    Measures every request when ``POLLS_INSTRUMENTATION`` is on, and
+    removes itself from the middleware stack otherwise.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.POLLS_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    @staticmethod
+    def finish(request, response, stats):
+        """Record the request and add the ``Server-Timing`` header."""
+        stats.total = time.perf_counter() - stats.started
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            timings.add(match.view_name, stats)
+        response.headers['Server-Timing'] = stats.server_timing()
+        return response
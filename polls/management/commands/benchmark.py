@@ -0,0 +1,131 @@
+import json
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from polls import async_views, views
+from polls.benchmark import (QueryCounter, benchmark_database, compare,
+                             mounted, run_async, run_sync, seed)
+from polls.models import Choice
+
+ENDPOINTS = ['index', 'detail', 'results', 'vote']
+HANDLERS = {'wsgi': views, 'asgi': async_views}
+# Options that change what is measured; a baseline only applies to runs
+# with the same ones.
+WORKLOAD = ['requests', 'concurrency', 'users', 'questions', 'choices',
+            'votes', 'seed']
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the polls pages and the vote endpoint, with the sync "
+            "views under WSGI and the async views under ASGI, on a "
+            "throwaway database of synthetic polls.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300,
+                            help="Requests per endpoint and handler.")
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help="Requests in flight at once under ASGI.")
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--questions', type=int, default=50)
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--votes', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Seed for the synthetic data and requests.")
+        parser.add_argument('--handlers', nargs='+', choices=list(HANDLERS),
+                            default=list(HANDLERS))
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS,
+                            default=ENDPOINTS)
+        parser.add_argument('--save-baseline', metavar='FILE',
+                            help="Write the results to a JSON file.")
+        parser.add_argument(
+            '--baseline', metavar='FILE',
+            help="Fail if the results are worse than this JSON file's.")
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help="Fraction by which req/s may fall and p95 latency may rise "
+                 "against the baseline (default 0.25).")
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        results = {}
+        with benchmark_database(), QueryCounter() as counter:
+            questions = seed(options['users'], options['questions'],
+                             options['choices'], options['votes'])
+            choices = {}
+            for question_id, choice_id in Choice.objects.values_list(
+                    'question', 'pk'):
+                choices.setdefault(question_id, []).append(choice_id)
+            voter = User.objects.order_by('pk').first()
+            picks = [random.choice(questions).pk
+                     for _ in range(options['requests'])]
+            for handler in options['handlers']:
+                with mounted(HANDLERS[handler]):
+                    for endpoint in options['endpoints']:
+                        requests = [self.request(endpoint, pk, choices)
+                                    for pk in picks]
+                        if handler == 'wsgi':
+                            client = Client()
+                            client.force_login(voter)
+                            run_sync(client, requests[:10], counter)
+                            stats = run_sync(client, requests, counter)
+                        else:
+                            client = AsyncClient()
+                            client.force_login(voter)
+                            run_async(client, requests[:10], counter)
+                            stats = run_async(client, requests, counter,
+                                              options['concurrency'])
+                        results[f'{handler} {endpoint}'] = stats
+
+        self.stdout.write(f"{'handler':8}{'endpoint':10}{'req/s':>10}"
+                          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+                          f"{'queries':>10}")
+        for key, stats in results.items():
+            handler, endpoint = key.split()
+            self.stdout.write(f"{handler:8}{endpoint:10}{stats['rps']:10.1f}"
+                              f"{stats['p50_ms']:10.2f}"
+                              f"{stats['p95_ms']:10.2f}"
+                              f"{stats['p99_ms']:10.2f}"
+                              f"{stats['queries']:10.2f}")
+
+        workload = {name: options[name] for name in WORKLOAD}
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as file:
+                json.dump({'workload': workload, 'results': results}, file,
+                          indent=2)
+        if options['baseline']:
+            self.check_baseline(options['baseline'], workload, results,
+                                options['tolerance'])
+
+    @staticmethod
+    def request(endpoint, pk, choices):
+        """Return the (path, data) of one request to an endpoint."""
+        if endpoint == 'index':
+            return reverse('polls:index'), None
+        if endpoint == 'vote':
+            return (reverse('polls:vote', args=(pk,)),
+                    {'choice': random.choice(choices[pk])})
+        return reverse(f'polls:{endpoint}', args=(pk,)), None
+
+    def check_baseline(self, path, workload, results, tolerance):
+        """Raise CommandError if any endpoint regressed from the baseline."""
+        try:
+            with open(path) as file:
+                baseline = json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Cannot read the baseline {path}: {error}")
+        if baseline.get('workload') != workload:
+            self.stderr.write(self.style.WARNING(
+                f"The baseline was measured with {baseline.get('workload')}, "
+                f"so the comparison may not be meaningful."))
+        regressions = compare(results, baseline.get('results', {}), tolerance)
+        for message in regressions:
+            self.stderr.write(message)
+        if regressions:
+            raise CommandError(f"{len(regressions)} regressions "
+                               f"against {path}.")
+        self.stdout.write(self.style.SUCCESS(
+            f"No regressions against {path}."))
@@ -0,0 +1,46 @@
+import random
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.benchmark import (benchmark_database, seed, template_contexts,
+                             time_renders)
+
+
+class Command(BaseCommand):
+    help = ("Time rendering each polls template on its own, on a throwaway "
+            "database of synthetic polls, using the current "
+            "TEMPLATE_PROFILE. Run it with TEMPLATE_PROFILE=default and "
+            "TEMPLATE_PROFILE=production to compare them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=500,
+                            help="Timed renders of each template.")
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        results = {}
+        with benchmark_database():
+            seed(1, options['questions'], options['choices'], 0)
+            request = RequestFactory().get(reverse('polls:index'))
+            request.user = User.objects.get()
+            for name, context in template_contexts(timezone.now()).items():
+                results[name] = time_renders(name, context, request,
+                                             options['renders'])
+
+        self.stdout.write(f"profile {settings.TEMPLATE_PROFILE}, "
+                          f"{options['renders']} renders")
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:<28} first {stats['first_ms']:7.2f} ms  "
+                f"p50 {stats['p50_ms']:6.3f} ms  "
+                f"p95 {stats['p95_ms']:6.3f} ms  "
+                f"{stats['rps']:8.0f} renders/s  "
+                f"{stats['queries']:.1f} queries")
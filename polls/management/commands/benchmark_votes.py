@@ -0,0 +1,98 @@
+import random
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from polls.benchmark import WriteTimer, benchmark_database, run_threaded, seed
+from polls.models import Choice
+
+
+class Command(BaseCommand):
+    help = ("Measure vote throughput with several threads voting at once, "
+            "on a throwaway SQLite file using the current DB_PROFILE. Run "
+            "it with DB_PROFILE=default and DB_PROFILE=production to "
+            "compare them. --hot sends every vote to the two choices of one "
+            "question, to compare --shards settings.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8,
+                            help="Users voting at the same time.")
+        parser.add_argument('--votes', type=int, default=100,
+                            help="Votes sent by each user.")
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--hot', action='store_true',
+            help="Vote on one question with two choices, each user "
+                 "switching choice on every vote, so every vote writes "
+                 "the same counters.")
+        parser.add_argument(
+            '--shards', type=int, default=settings.POLLS_COUNTER_SHARDS,
+            help="Counter shards per choice (default "
+                 "POLLS_COUNTER_SHARDS; 0 for one counter).")
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        with tempfile.TemporaryDirectory() as folder, \
+                benchmark_database(Path(folder, 'benchmark.sqlite3')):
+            if options['hot']:
+                seed(options['threads'], 1, 2, 0)
+            else:
+                seed(options['threads'], options['questions'],
+                     options['choices'], 0)
+            choices = {}
+            for question_id, choice_id in Choice.objects.values_list(
+                    'question', 'pk'):
+                choices.setdefault(question_id, []).append(choice_id)
+            clients = []
+            for user in User.objects.order_by('pk'):
+                client = Client()
+                client.force_login(user)
+                clients.append(client)
+            if options['hot']:
+                [(question_id, pair)] = choices.items()
+                url = reverse('polls:vote', args=(question_id,))
+                requests = [
+                    [(url, {'choice': pair[(n + vote) % 2]})
+                     for vote in range(options['votes'])]
+                    for n in range(len(clients))]
+            else:
+                requests = [
+                    [(reverse('polls:vote', args=(question_id,)),
+                      {'choice': random.choice(choices[question_id])})
+                     for question_id in random.choices(list(choices),
+                                                       k=options['votes'])]
+                    for _ in clients]
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                journal_mode = cursor.fetchone()[0]
+            connection.close()
+            with override_settings(POLLS_COUNTER_SHARDS=options['shards']), \
+                    WriteTimer() as timer:
+                stats = run_threaded(clients, requests)
+                wrong = Choice.objects.rebuild_vote_counts(commit=False)
+            connection.close()
+
+        self.stdout.write(
+            f"profile {settings.DB_PROFILE}, journal {journal_mode}, "
+            f"{options['threads']} threads, {options['shards']} counter "
+            f"shards{', hot choice' if options['hot'] else ''}")
+        self.stdout.write(
+            f"{stats['requests']} votes saved, {stats['errors']} failed "
+            f"with database errors")
+        self.stdout.write(
+            f"{stats['rps']:.1f} votes/s, p50 {stats['p50_ms']:.2f} ms, "
+            f"p95 {stats['p95_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+        self.stdout.write(
+            f"{timer.seconds * 1000 / max(stats['requests'], 1):.2f} ms per "
+            f"vote in writes, lock waits included")
+        if wrong:
+            self.stderr.write(self.style.ERROR(
+                f"{len(wrong)} vote counters disagree with the votes."))
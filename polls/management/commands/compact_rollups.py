@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from polls.models import VoteRollup
+
+
+class Command(BaseCommand):
+    help = ("Drop the hourly vote counts that moved votes left at zero, "
+            "or recount them from the votes with --rebuild.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help="Recount every hour from the Vote rows, for votes loaded "
+                 "without going through the vote view.")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            with transaction.atomic():
+                VoteRollup.objects.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt {VoteRollup.objects.count()} hourly vote counts."))
+        else:
+            removed = VoteRollup.objects.compact()
+            self.stdout.write(self.style.SUCCESS(
+                f"Compacted hourly vote counts, {removed} rows removed."))
@@ -0,0 +1,78 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from polls.exports import csv_lines, json_lines, result_rows, write_parquet
+from polls.models import Question
+
+
+def moment(value):
+    """
+    The function parses an ISO date or date-time, in the current time zone
+    unless it gives its own.
+    :return: an aware datetime.
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        parsed = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = ("Export every question's choices and vote counts as CSV, "
+            "JSON lines or Parquet.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'jsonl', 'parquet'],
+                            default='csv')
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help="File to write, or '-' for standard output (the default). "
+                 "Parquet needs a file.")
+        parser.add_argument('--published-after', type=moment, metavar='DATE')
+        parser.add_argument('--published-before', type=moment,
+                            metavar='DATE')
+        parser.add_argument('--ends-after', type=moment, metavar='DATE')
+        parser.add_argument('--ends-before', type=moment, metavar='DATE')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Rows fetched from the database at a time.")
+
+    def handle(self, *args, **options):
+        lookups = {
+            'pub_date__gte': options['published_after'],
+            'pub_date__lt': options['published_before'],
+            'end_date__gte': options['ends_after'],
+            'end_date__lt': options['ends_before'],
+        }
+        lookups = {key: value for key, value in lookups.items()
+                   if value is not None}
+        questions = Question.objects.filter(**lookups) if lookups else None
+        rows = result_rows(questions, options['chunk_size'])
+        fmt, output = options['format'], options['output']
+
+        if fmt == 'parquet':
+            if output == '-':
+                raise CommandError("Parquet export needs --output.")
+            try:
+                count = write_parquet(rows, output)
+            except ImportError:
+                raise CommandError("Parquet export needs pyarrow, "
+                                   "install it with 'pip install pyarrow'.")
+            self.stderr.write(f"Exported {count} rows to {output}.")
+            return
+
+        lines = csv_lines(rows) if fmt == 'csv' else json_lines(rows)
+        if output == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+        else:
+            newline = '' if fmt == 'csv' else None
+            with open(output, 'w', encoding='utf-8', newline=newline) as file:
+                file.writelines(lines)
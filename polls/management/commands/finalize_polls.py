@@ -0,0 +1,51 @@
+import contextlib
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from polls.models import ResultSnapshot
+
+
+class Command(BaseCommand):
+    help = ("Freeze the results of closed polls into snapshots, once or "
+            "every --interval seconds, and optionally remove the votes of "
+            "polls that closed long ago.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help="Keep finalizing, this many seconds apart.")
+        parser.add_argument(
+            '--grace', type=float, default=60,
+            help="Seconds after a poll closes before it is finalized, for "
+                 "votes still being written (default 60).")
+        parser.add_argument(
+            '--archive-votes', type=float, metavar='DAYS',
+            help="Delete the votes of finalized polls that closed more than "
+                 "DAYS days ago. Their counts and snapshots are kept.")
+        parser.add_argument(
+            '--archive-to', metavar='FILE',
+            help="Append the deleted votes to FILE as JSON lines, which "
+                 "load_polls can load again.")
+
+    def handle(self, *args, **options):
+        if options['archive_to'] and options['archive_votes'] is None:
+            raise CommandError("--archive-to needs --archive-votes.")
+        while True:
+            now = timezone.now()
+            finalized = ResultSnapshot.objects.finalize(
+                now - datetime.timedelta(seconds=options['grace']))
+            self.stdout.write(f"Finalized {finalized} polls.")
+            if options['archive_votes'] is not None:
+                before = now - datetime.timedelta(
+                    days=options['archive_votes'])
+                with contextlib.ExitStack() as stack:
+                    stream = options['archive_to'] and stack.enter_context(
+                        open(options['archive_to'], 'a', encoding='utf-8'))
+                    archived = ResultSnapshot.objects.archive_votes(
+                        before, stream or None)
+                self.stdout.write(f"Archived {archived} votes.")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,169 @@
+import json
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from polls.caching import invalidate_index
+from polls.models import Choice, VoteRollup
+
+# Models in the order their rows must be inserted.
+MODELS = ['auth.user', 'polls.question', 'polls.choice', 'polls.vote']
+
+
+def iter_json_array(stream, read_size=1 << 16):
+    """
+    The function reads the objects of a JSON array one at a time, holding
+    only about `read_size` characters of the file in memory.
+
+    :param stream: A text file whose content is a JSON array of objects.
+    :param read_size: Characters to read at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer = stream.read(read_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError("Expected a JSON array of objects.")
+    pos = 1
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if buffer.startswith(']', pos):
+            return
+        try:
+            obj, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            more = stream.read(read_size)
+            if not more:
+                raise CommandError("The JSON array ends unexpectedly.")
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+        yield obj
+        if pos > read_size:
+            buffer, pos = buffer[pos:], 0
+
+
+def iter_json_lines(stream):
+    """
+    The function reads one JSON object from each non-empty line.
+    :param stream: A text file in the JSON-lines format.
+    """
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                raise CommandError(f"Line {number}: {error}")
+
+
+class Command(BaseCommand):
+    help = ("Load users, questions, choices and votes from a fixture in "
+            "the loaddata format, or the same objects as JSON lines, with "
+            "constant memory and bulk inserts.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixtures', nargs='+', type=Path)
+        parser.add_argument(
+            '--format', choices=['json', 'jsonl'],
+            help="Input format. By default .jsonl and .ndjson files are read "
+                 "as JSON lines and anything else as a JSON array.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Rows per bulk insert.")
+        parser.add_argument('--chunk-size', type=int, default=20000,
+                            help="Rows per transaction.")
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.batch_size = options['batch_size']
+        self.chunk_size = options['chunk_size']
+        self.buffers = {label: [] for label in MODELS}
+        self.buffered = 0
+        self.loaded = dict.fromkeys(MODELS, 0)
+        started = time.perf_counter()
+        for fixture in options['fixtures']:
+            fmt = options['format'] or (
+                'jsonl' if fixture.suffix in ('.jsonl', '.ndjson')
+                else 'json')
+            with fixture.open(encoding='utf-8') as stream:
+                reader = (iter_json_lines(stream) if fmt == 'jsonl'
+                          else iter_json_array(stream))
+                for obj in reader:
+                    self.add(obj)
+        self.flush()
+        if self.loaded['polls.vote']:
+            Choice.objects.rebuild_vote_counts()
+            VoteRollup.objects.rebuild()
+        if self.loaded['polls.question'] or self.loaded['polls.choice']:
+            # Bulk writes send no signals.
+            invalidate_index()
+        elapsed = time.perf_counter() - started
+        total = sum(self.loaded.values())
+        for label, count in self.loaded.items():
+            if count:
+                self.stdout.write(f"{label}: {count} rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {total} rows in {elapsed:.1f}s "
+            f"({total / elapsed if elapsed else 0:.0f} rows/s)."))
+
+    def add(self, obj):
+        """Buffer one fixture object, flushing once a chunk is full."""
+        label = obj.get('model', '').lower()
+        if label not in self.buffers:
+            raise CommandError(f"Cannot load objects of model '{label}'.")
+        deserialized = next(serializers.deserialize('python', [obj]))
+        self.buffers[label].append(deserialized.object)
+        self.buffered += 1
+        if self.buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Insert the buffered rows in one transaction, parents first."""
+        if not self.buffered:
+            return
+        with transaction.atomic():
+            for label in MODELS:
+                objs = self.buffers[label]
+                if not objs:
+                    continue
+                model = apps.get_model(label)
+                unique_fields = [model._meta.pk.name]
+                if label == 'polls.vote':
+                    self.fill_vote_questions(objs)
+                    objs[:] = self.last_votes(objs)
+                    # A user's vote may already be stored under another id.
+                    unique_fields = ['user', 'question']
+                fields = [field.name for field in model._meta.concrete_fields
+                          if not field.primary_key
+                          and field.name not in unique_fields]
+                model.objects.bulk_create(
+                    objs, batch_size=self.batch_size, update_conflicts=True,
+                    unique_fields=unique_fields, update_fields=fields)
+                self.loaded[label] += len(objs)
+                objs.clear()
+        self.buffered = 0
+        if self.verbosity >= 2:
+            self.stdout.write(f"{sum(self.loaded.values())} rows loaded")
+
+    @staticmethod
+    def last_votes(votes):
+        """
+        The function keeps the last of several votes by one user on one
+        question, which old fixtures may hold.
+        :return: a list of votes.
+        """
+        return list({(vote.user_id, vote.question_id): vote
+                     for vote in votes}.values())
+
+    @staticmethod
+    def fill_vote_questions(votes):
+        """Fill in the question of votes from fixtures that predate it."""
+        missing = {vote.choice_id for vote in votes
+                   if vote.question_id is None}
+        if missing:
+            questions = dict(Choice.objects.filter(pk__in=missing)
+                             .values_list('pk', 'question_id'))
+            for vote in votes:
+                if vote.question_id is None:
+                    vote.question_id = questions.get(vote.choice_id)
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.models import ChoiceCounterShard
+
+
+class Command(BaseCommand):
+    help = ("Fold the vote counter shards into each choice's counter, once "
+            "or every --interval seconds.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help="Keep merging, this many seconds apart.")
+
+    def handle(self, *args, **options):
+        while True:
+            merged = ChoiceCounterShard.objects.merge()
+            self.stdout.write(f"Merged {merged} counter shards.")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
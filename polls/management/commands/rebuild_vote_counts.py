@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from polls.models import Choice
+
+
+class Command(BaseCommand):
+    help = ("Recount the per-choice vote counters from the Vote rows, "
+            "or verify them with --check.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only report counters that disagree with the Vote rows.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            wrong = Choice.objects.rebuild_vote_counts(
+                commit=not options['check'])
+        for pk, stored, count in wrong:
+            self.stderr.write(f"Choice {pk}: counter was {stored}, "
+                              f"but it has {count} votes.")
+        if options['check']:
+            if wrong:
+                raise CommandError(f"{len(wrong)} vote counters are wrong.")
+            self.stdout.write(self.style.SUCCESS("All vote counters match."))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt vote counters, {len(wrong)} were corrected."))
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.routers import sync_replica
+
+
+class Command(BaseCommand):
+    help = ("Copy the primary SQLite database over each of "
+            "POLLS_READ_DATABASES, once or every --interval seconds.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help="Keep copying, this many seconds apart.")
+
+    def handle(self, *args, **options):
+        if not settings.POLLS_READ_DATABASES:
+            raise CommandError("POLLS_READ_DATABASES is empty, try "
+                               "--settings=mysite.settings_replicas.")
+        while True:
+            for alias in settings.POLLS_READ_DATABASES:
+                sync_replica(alias)
+                self.stdout.write(f"Copied default to {alias}.")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+
+def count_existing_votes(apps, schema_editor):
+    """Fill the new counters from the votes that already exist."""
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    db = schema_editor.connection.alias
+    counts = (Vote.objects.using(db).values_list('choice')
+              .annotate(models.Count('pk')).order_by())
+    for choice_id, count in counts:
+        Choice.objects.using(db).filter(pk=choice_id).update(
+            vote_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_alter_question_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='vote_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing_votes, migrations.RunPython.noop),
+    ]
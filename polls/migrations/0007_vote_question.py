@@ -0,0 +1,46 @@
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+import django.db.models.deletion
+
+
+def fill_vote_question(apps, schema_editor):
+    """
+    Copy each vote's question from its choice, then keep only the latest
+    vote of a user for a question so the unique constraint can be added.
+    """
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    db = schema_editor.connection.alias
+    Vote.objects.using(db).update(question=Subquery(
+        Choice.objects.using(db).filter(pk=OuterRef('choice')).values('question')[:1]))
+    duplicates = (Vote.objects.using(db).values('user', 'question')
+                  .annotate(votes=Count('pk'), latest=Max('pk'))
+                  .filter(votes__gt=1).order_by())
+    removed = 0
+    for duplicate in duplicates:
+        removed += Vote.objects.using(db).filter(
+            user=duplicate['user'], question=duplicate['question'],
+            pk__lt=duplicate['latest']).delete()[0]
+    if removed:
+        Choice.objects.using(db).update(vote_count=0)
+        counts = (Vote.objects.using(db).values_list('choice')
+                  .annotate(Count('pk')).order_by())
+        for choice_id, count in counts:
+            Choice.objects.using(db).filter(pk=choice_id).update(
+                vote_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_choice_vote_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+        migrations.RunPython(fill_vote_question, migrations.RunPython.noop),
+    ]
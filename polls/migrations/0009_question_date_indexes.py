@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:15
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_vote_unique_vote_per_question'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='question',
+            name='end_date',
+            field=models.DateTimeField(blank=True, db_index=True, default=None, null=True, verbose_name='date ended'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='pub_date',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='date published'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def roll_up_existing_votes(apps, schema_editor):
+    """
+    Count the existing votes into the hour of the migration, which is
+    the time their new created_at field is set to.
+    """
+    Vote = apps.get_model('polls', 'Vote')
+    VoteRollup = apps.get_model('polls', 'VoteRollup')
+    db = schema_editor.connection.alias
+    hour = django.utils.timezone.now().replace(minute=0, second=0,
+                                               microsecond=0)
+    VoteRollup.objects.using(db).bulk_create(
+        (VoteRollup(question_id=question_id, choice_id=choice_id,
+                    hour=hour, count=count)
+         for question_id, choice_id, count
+         in Vote.objects.using(db).values_list('question', 'choice')
+         .annotate(models.Count('pk')).order_by()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_question_pub_date_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='VoteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('count', models.IntegerField()),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour', 'question'], name='polls_rollup_hour_question'), models.Index(fields=['question', 'hour'], name='polls_rollup_question_hour')],
+            },
+        ),
+        migrations.RunPython(roll_up_existing_votes,
+                             migrations.RunPython.noop),
+    ]
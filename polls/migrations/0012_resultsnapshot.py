@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0011_vote_created_at_voterollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultSnapshot',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='polls.question')),
+                ('results', models.JSONField()),
+                ('finalized_at', models.DateTimeField(null=True)),
+                ('votes_archived', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
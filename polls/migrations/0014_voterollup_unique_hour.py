@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def merge_rollup_rows(apps, schema_editor):
+    """
+    Merge the rows each vote used to add into one per choice and hour, so
+    the unique constraint can be added.
+    """
+    VoteRollup = apps.get_model('polls', 'VoteRollup')
+    db = schema_editor.connection.alias
+    merged = [VoteRollup(**group) for group in
+              VoteRollup.objects.using(db)
+              .values('question_id', 'choice_id', 'hour')
+              .annotate(count=Sum('count')).order_by().exclude(count=0)]
+    VoteRollup.objects.using(db).all().delete()
+    VoteRollup.objects.using(db).bulk_create(merged, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0013_choicecountershard'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_rollup_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='voterollup',
+            constraint=models.UniqueConstraint(fields=('question', 'choice', 'hour'), name='unique_rollup_hour'),
+        ),
+    ]
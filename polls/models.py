@@ -1,10 +1,130 @@
 import datetime
-from django.db import models
+from collections import defaultdict
+
+from django.conf import settings
+from django.core import serializers
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import (BooleanField, Case, Count, ExpressionWrapper, F,
+                              Max, Min, OuterRef, Prefetch, Q, Subquery, Sum,
+                              Value, When)
+from django.db.models.functions import Coalesce, Greatest, TruncHour
+from django.dispatch import Signal
 from django.utils import timezone
 from django.contrib import admin
 from django.contrib.auth.models import User
 
 
+# Sent with ``question_ids`` after a transaction that changed votes commits.
+votes_changed = Signal()
+
+
+class QuestionQuerySet(models.QuerySet):
+    """
+    QuerySet for questions that works out voting status in the database.
+    """
+
+    def published(self, now=None):
+        """
+        The function filters out questions that are not published yet.
+        :param now: The time to compare against, defaults to now.
+        """
+        return self.filter(pub_date__lte=now or timezone.now())
+
+    def with_status(self, now=None):
+        """
+        The function annotates each question with `is_open`, which has the
+        same meaning as `Question.can_vote()` at the given time.
+        :param now: The time to compare against, defaults to now.
+        """
+        return self.annotate(is_open=ExpressionWrapper(
+            _open_at(now), output_field=BooleanField()))
+
+    def open(self, now=None):
+        """
+        The function keeps the questions that are open for voting, in the
+        same sense as `Question.can_vote()` at the given time.
+        :param now: The time to compare against, defaults to now.
+        """
+        return self.filter(_open_at(now))
+
+    def most_active(self, since):
+        """
+        The function keeps the questions with votes cast since a time,
+        most votes first, counting from the hourly `VoteRollup` rows so
+        the votes themselves are not read.
+
+        :param since: The start of the period, rounded down to the hour.
+        """
+        return (self.filter(voterollup__hour__gte=hour_of(since))
+                .annotate(activity=Sum('voterollup__count'))
+                .filter(activity__gt=0)
+                .order_by('-activity', '-pk'))
+
+    def next_boundary(self, now=None):
+        """
+        The function finds the next time a question opens or closes.
+        :param now: The time to look forward from, defaults to now.
+        :return: a datetime, or None if no question will open or close.
+        """
+        bounds = self.aggregate(**_upcoming_boundaries(now))
+        return min(filter(None, bounds.values()), default=None)
+
+    async def anext_boundary(self, now=None):
+        """Async version of `next_boundary`."""
+        bounds = await self.aaggregate(**_upcoming_boundaries(now))
+        return min(filter(None, bounds.values()), default=None)
+
+    def last_boundary(self, now=None):
+        """
+        The function finds the last time a question opened or closed.
+        :param now: The time to look back from, defaults to now.
+        :return: a datetime, or None if no question has opened yet.
+        """
+        bounds = self.aggregate(**_past_boundaries(now))
+        return max(filter(None, bounds.values()), default=None)
+
+    async def alast_boundary(self, now=None):
+        """Async version of `last_boundary`."""
+        bounds = await self.aaggregate(**_past_boundaries(now))
+        return max(filter(None, bounds.values()), default=None)
+
+
+def hour_of(moment):
+    """
+    The function rounds a time down to the start of its hour in UTC.
+    :return: a datetime.
+    """
+    return moment.astimezone(datetime.timezone.utc).replace(
+        minute=0, second=0, microsecond=0)
+
+
+def results_cache_key(question_id):
+    """The cache key of a question's merged results."""
+    return f'polls:results:{question_id}'
+
+
+def _open_at(now=None):
+    """The condition of a question being open for voting at a time."""
+    now = now or timezone.now()
+    return (Q(pub_date__lte=now)
+            & (Q(end_date__isnull=True) | Q(end_date__gte=now)))
+
+
+def _upcoming_boundaries(now=None):
+    """Aggregates for the next publication and end dates after now."""
+    now = now or timezone.now()
+    return {'opens': Min('pub_date', filter=Q(pub_date__gt=now)),
+            'closes': Min('end_date', filter=Q(end_date__gte=now))}
+
+
+def _past_boundaries(now=None):
+    """Aggregates for the last publication and end dates before now."""
+    now = now or timezone.now()
+    return {'opened': Max('pub_date', filter=Q(pub_date__lte=now)),
+            'closed': Max('end_date', filter=Q(end_date__lt=now))}
+
+
 class Question(models.Model):
     """
     A model representing a question for poll.
@@ -17,7 +137,15 @@ class Question(models.Model):
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published', default=timezone.now)
     end_date = models.DateTimeField('date ended', null=True, blank=True,
-                                    default=None)
+                                    default=None, db_index=True)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pub_date', 'id'],
+                         name='polls_question_pub_date_id'),
+        ]
 
     @admin.display(
         boolean=True,
@@ -42,6 +170,65 @@ class Question(models.Model):
         else:
             return self.is_published() and self.end_date >= timezone.now()
 
+    def results(self, refresh=False):
+        """
+        The function loads the vote count of every choice in one query and
+        adds them up into the total. With ``POLLS_COUNTER_SHARDS`` on, the
+        merged counts are cached for ``POLLS_COUNTER_CACHE_TTL`` seconds, so
+        on a busy poll they may miss the latest votes for that long.
+        :param refresh: Whether to count again and replace the cached counts.
+        :return: a dict with the question, its choices and the total votes.
+        """
+        results = None if refresh else self._cached_results()
+        if results is None:
+            results = self._cache_results(
+                self._results(list(self._choice_counts())))
+        return results
+
+    async def aresults(self, refresh=False):
+        """Async version of `results`."""
+        results = None if refresh else self._cached_results()
+        if results is None:
+            results = self._cache_results(self._results(
+                [choice async for choice in self._choice_counts()]))
+        return results
+
+    def frozen_results(self):
+        """
+        The function returns the results saved when the question was
+        finalized. Load questions with ``select_related('resultsnapshot')``
+        to avoid a query.
+        :return: a dict like `results`, or None if the question has no up
+            to date snapshot.
+        """
+        snapshot = getattr(self, 'resultsnapshot', None)
+        if snapshot is None or snapshot.finalized_at is None:
+            return None
+        return snapshot.results
+
+    def _cached_results(self):
+        if settings.POLLS_COUNTER_SHARDS:
+            return cache.get(results_cache_key(self.pk))
+        return None
+
+    def _cache_results(self, results):
+        if settings.POLLS_COUNTER_SHARDS:
+            cache.set(results_cache_key(self.pk), results,
+                      settings.POLLS_COUNTER_CACHE_TTL)
+        return results
+
+    def _choice_counts(self):
+        return self.choice_set.with_votes().order_by('pk').values(
+            'id', text=F('choice_text'), votes=F('current_votes'))
+
+    def _results(self, choices):
+        return {
+            "id": self.pk,
+            "question_text": self.question_text,
+            "choices": choices,
+            "total": sum(choice["votes"] for choice in choices),
+        }
+
     def was_published_recently(self):
         """
         The function checks if the publication date of an object is within the
@@ -59,6 +246,68 @@ class Question(models.Model):
         return self.question_text
 
 
+class ChoiceQuerySet(models.QuerySet):
+    """
+    QuerySet for choices that can add up their counter shards.
+    """
+
+    def with_votes(self):
+        """
+        The function annotates each choice with `current_votes`, its counter
+        plus the deltas still waiting in its `ChoiceCounterShard` rows.
+        """
+        shards = (ChoiceCounterShard.objects.filter(choice=OuterRef('pk'))
+                  .values('choice').annotate(total=Sum('count'))
+                  .values('total'))
+        return self.annotate(current_votes=F('vote_count') + Coalesce(
+            Subquery(shards), 0))
+
+
+class ChoiceManager(models.Manager.from_queryset(ChoiceQuerySet)):
+    """
+    Manager for choices that keeps the denormalized vote counters in step
+    with the `Vote` rows.
+    """
+
+    def adjust_vote_counts(self, deltas):
+        """
+        The function adds a delta to the vote counter of each choice.
+        Counters never drop below zero.
+
+        :param deltas: a mapping of choice id to the change in its votes.
+        """
+        for choice_id, delta in deltas.items():
+            if delta:
+                self.filter(pk=choice_id).update(
+                    vote_count=Greatest(F('vote_count') + delta, Value(0)))
+
+    def rebuild_vote_counts(self, commit=True):
+        """
+        The function recounts every counter from the raw `Vote` rows.
+
+        :param commit: Whether to save the corrected counters.
+        :return: a list of (choice id, stored count, actual count) for the
+            counters that were wrong.
+        """
+        actual = dict(Vote.objects.values_list('choice')
+                      .annotate(models.Count('pk')).order_by())
+        wrong = []
+        # Questions whose votes were archived keep their counters.
+        for choice in (self.exclude(
+                question__resultsnapshot__votes_archived=True)
+                .with_votes().only('pk', 'vote_count').iterator()):
+            count = actual.get(choice.pk, 0)
+            if choice.current_votes != count:
+                wrong.append((choice.pk, choice.current_votes, count))
+                choice.vote_count = count
+                if commit:
+                    with transaction.atomic():
+                        choice.save(update_fields=['vote_count'])
+                        ChoiceCounterShard.objects.filter(
+                            choice=choice).delete()
+        return wrong
+
+
 class Choice(models.Model):
     """
     A model representing a choice for a question in poll.
@@ -66,17 +315,28 @@ class Choice(models.Model):
     Attributes:
         question: The question to which this choice belongs.
         choice_text: The text of the choice.
+        vote_count: The number of votes for this choice, maintained
+            alongside the `Vote` rows, not counting the votes still in its
+            `ChoiceCounterShard` rows.
     """
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    vote_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = ChoiceManager()
 
     @property
     def votes(self):
         """
-        The function returns the number of votes for a choice.
+        The function returns the number of votes for a choice, including
+        the votes still in its counter shards. Choices loaded with
+        `ChoiceQuerySet.with_votes` need no query.
         :return: an integer value.
         """
-        return self.vote_set.count()
+        if hasattr(self, 'current_votes'):
+            return self.current_votes
+        return self.vote_count + (self.choicecountershard_set.aggregate(
+            total=Sum('count'))['total'] or 0)
 
     def __str__(self):
         """
@@ -93,9 +353,350 @@ class Choice(models.Model):
         return self.votes
 
 
+class ChoiceCounterShardManager(models.Manager):
+    """
+    Manager for the partial vote counters of choices.
+    """
+
+    def add(self, deltas):
+        """
+        The function adds a delta to each shard, creating missing shards.
+
+        :param deltas: a mapping of (choice id, shard) to the change in its
+            votes.
+        """
+        for (choice_id, shard), delta in deltas.items():
+            if not delta:
+                continue
+            row = self.filter(choice_id=choice_id, shard=shard)
+            if not row.update(count=F('count') + delta):
+                self.bulk_create([ChoiceCounterShard(choice_id=choice_id,
+                                                     shard=shard)],
+                                 ignore_conflicts=True)
+                row.update(count=F('count') + delta)
+
+    def merge(self):
+        """
+        The function moves the counts of every shard into its choice's
+        `vote_count`. Shards are decremented by what was moved rather than
+        deleted, so votes counted meanwhile are kept.
+        :return: the number of shards merged.
+        """
+        with transaction.atomic():
+            shards = list(self.exclude(count=0)
+                          .values_list('pk', 'choice_id', 'count'))
+            totals = defaultdict(int)
+            for pk, choice_id, count in shards:
+                self.filter(pk=pk).update(count=F('count') - count)
+                totals[choice_id] += count
+            Choice.objects.adjust_vote_counts(totals)
+        return len(shards)
+
+
+class ChoiceCounterShard(models.Model):
+    """
+    One of ``POLLS_COUNTER_SHARDS`` partial vote counters of a choice.
+
+    With shards on, votes update the shard picked by the voter's id
+    rather than the choice's own `vote_count`, so concurrent voters for a
+    popular choice do not all update one row. A choice's votes are its
+    `vote_count` plus its shards (see `ChoiceQuerySet.with_votes`), and
+    ``merge_counters`` folds the shards back into `vote_count`.
+    """
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    objects = ChoiceCounterShardManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'shard'],
+                                    name='unique_counter_shard'),
+        ]
+
+
+class VoteManager(models.Manager):
+    """
+    Manager for votes that updates the choice counters on every write.
+    """
+
+    def record(self, user, choice):
+        """
+        The function saves the user's vote for a choice, moving any vote
+        the user already has for the same question, and updates the vote
+        counters in the same transaction.
+
+        :param user: The user who votes.
+        :param choice: The selected choice.
+        """
+        self.record_many([(user.pk, choice.question_id, choice.pk)])
+
+    def record_many(self, ballots):
+        """
+        The function saves many votes with a single upsert (INSERT ... ON
+        CONFLICT DO UPDATE on the user and question) and updates the vote
+        counters in the same transaction. When a user votes on a question
+        more than once only the last choice is kept.
+
+        :param ballots: (user id, question id, choice id) tuples.
+        """
+        latest = {(user_id, question_id): choice_id
+                  for user_id, question_id, choice_id in ballots}
+        if not latest:
+            return
+        user_ids = {user_id for user_id, _ in latest}
+        question_ids = {question_id for _, question_id in latest}
+        now = timezone.now()
+        with transaction.atomic():
+            # Locking the voters, in a fixed order, makes concurrent votes
+            # by one user wait for each other. Locking their votes alone
+            # would not cover a first vote, which has no row to lock yet,
+            # and both transactions would then count it.
+            list(User.objects.select_for_update().filter(pk__in=user_ids)
+                 .order_by('pk').values_list('pk', flat=True))
+            previous = {
+                (user_id, question_id): (choice_id, created_at)
+                for user_id, question_id, choice_id, created_at
+                in self.filter(user_id__in=user_ids,
+                               question_id__in=question_ids)
+                .values_list('user_id', 'question_id', 'choice_id',
+                             'created_at')
+            }
+            shards = settings.POLLS_COUNTER_SHARDS
+            changed, deltas, rollups = [], defaultdict(int), defaultdict(int)
+            for (user_id, question_id), choice_id in latest.items():
+                old_choice_id, old_created_at = previous.get(
+                    (user_id, question_id), (None, None))
+                if old_choice_id == choice_id:
+                    continue
+                # With shards, each user's votes go to one shard row.
+                shard = (user_id % shards,) if shards else ()
+                if old_choice_id is not None:
+                    deltas[(old_choice_id, *shard)] -= 1
+                    rollups[question_id, old_choice_id,
+                            hour_of(old_created_at)] -= 1
+                deltas[(choice_id, *shard)] += 1
+                rollups[question_id, choice_id, hour_of(now)] += 1
+                changed.append(Vote(user_id=user_id, question_id=question_id,
+                                    choice_id=choice_id, created_at=now))
+            self.bulk_create(changed, update_conflicts=True,
+                             unique_fields=['user', 'question'],
+                             update_fields=['choice', 'created_at'])
+            if shards:
+                ChoiceCounterShard.objects.add(deltas)
+            else:
+                Choice.objects.adjust_vote_counts(
+                    {choice_id: delta for (choice_id,), delta
+                     in deltas.items()})
+            VoteRollup.objects.add(rollups)
+            changed_questions = {vote.question_id for vote in changed}
+            if changed_questions:
+                transaction.on_commit(lambda: votes_changed.send(
+                    sender=Vote, question_ids=changed_questions))
+
+
 class Vote(models.Model):
     """
     Record a vote for a choice in a particular question.
+
+    Each user has at most one vote per question. The question is stored
+    alongside the choice so that this can be enforced by the database.
+    `created_at` is when the vote was cast, or last moved to another
+    choice.
     """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = VoteManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'],
+                                    name='unique_vote_per_question'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'choice'],
+                         name='polls_vote_question_choice'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        The function fills in the question from the choice before saving.
+        """
+        if self.question_id is None:
+            self.question_id = self.choice.question_id
+        super().save(*args, **kwargs)
+
+
+class VoteRollupManager(models.Manager):
+    """
+    Manager for the hourly vote counts.
+    """
+
+    def add(self, deltas):
+        """
+        The function adds a delta to the row of each choice and hour,
+        creating the missing rows, in three queries however many rows
+        change.
+
+        :param deltas: a mapping of (question id, choice id, hour) to the
+            change in its votes.
+        """
+        deltas = {bucket: delta for bucket, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        self.bulk_create((VoteRollup(question_id=question_id,
+                                     choice_id=choice_id, hour=hour, count=0)
+                          for question_id, choice_id, hour in deltas),
+                         batch_size=1000, ignore_conflicts=True)
+        pks = {
+            (question_id, choice_id, hour): pk
+            for pk, question_id, choice_id, hour in self.filter(
+                question_id__in={bucket[0] for bucket in deltas},
+                choice_id__in={bucket[1] for bucket in deltas},
+                hour__in={bucket[2] for bucket in deltas})
+            .values_list('pk', 'question_id', 'choice_id', 'hour')}
+        changes = [(pks[bucket], delta) for bucket, delta in deltas.items()]
+        self.filter(pk__in=[pk for pk, _ in changes]).update(
+            count=F('count') + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in changes],
+                default=Value(0)))
+
+    def compact(self):
+        """
+        The function drops the rows of hours whose votes all moved away.
+        :return: the number of rows removed.
+        """
+        return self.filter(count=0).delete()[0]
+
+    def rebuild(self):
+        """
+        The function recounts every row from the `Vote` table, for votes
+        written without `Vote.objects.record_many`, such as by fixtures.
+        """
+        with transaction.atomic():
+            # Questions whose votes were archived keep their rows.
+            self.exclude(
+                question__resultsnapshot__votes_archived=True).delete()
+            votes = Vote.objects.exclude(
+                question__resultsnapshot__votes_archived=True)
+            self.bulk_create(
+                (VoteRollup(**group) for group in
+                 votes.values('question_id', 'choice_id',
+                              hour=TruncHour('created_at',
+                                             tzinfo=datetime.timezone.utc))
+                 .annotate(count=Count('pk')).order_by()),
+                batch_size=1000)
+
+
+class VoteRollup(models.Model):
+    """
+    The number of votes for a choice cast in an hour and still standing.
+
+    A vote adds one to the hour it is cast in, and moving it to another
+    choice takes one from its old choice and hour. Each choice has one row
+    per hour, so the rows grow with the hours that had votes, not with the
+    votes. Summing the rows of a choice gives its number of votes.
+    """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    hour = models.DateTimeField()
+    count = models.IntegerField()
+
+    objects = VoteRollupManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'choice', 'hour'],
+                                    name='unique_rollup_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['hour', 'question'],
+                         name='polls_rollup_hour_question'),
+            models.Index(fields=['question', 'hour'],
+                         name='polls_rollup_question_hour'),
+        ]
+
+
+class ResultSnapshotManager(models.Manager):
+    """
+    Manager for the frozen results of closed questions.
+    """
+
+    def finalize(self, before):
+        """
+        The function freezes the results of every question that closed
+        before a time and has no up to date snapshot.
+
+        :param before: Questions that ended before this are finalized. It
+            should leave time for votes still being written to land.
+        :return: the number of questions finalized.
+        """
+        now = timezone.now()
+        questions = (
+            Question.objects.filter(end_date__lt=before)
+            .filter(Q(resultsnapshot__isnull=True)
+                    | Q(resultsnapshot__finalized_at__isnull=True))
+            .prefetch_related(Prefetch(
+                'choice_set',
+                queryset=Choice.objects.with_votes().order_by('pk'))))
+        snapshots = [
+            ResultSnapshot(
+                question=question, finalized_at=now,
+                results=question._results([
+                    {'id': choice.pk, 'text': choice.choice_text,
+                     'votes': choice.current_votes}
+                    for choice in question.choice_set.all()]))
+            for question in questions]
+        self.bulk_create(snapshots, batch_size=500, update_conflicts=True,
+                         unique_fields=['question'],
+                         update_fields=['results', 'finalized_at'])
+        return len(snapshots)
+
+    def archive_votes(self, before, stream=None):
+        """
+        The function deletes the votes of finalized questions that closed
+        before a time, keeping their counters and snapshots.
+
+        :param before: Questions that ended before this are archived.
+        :param stream: A text file the votes are first written to as JSON
+            lines, which ``load_polls`` can load again.
+        :return: the number of votes deleted.
+        """
+        snapshots = self.filter(votes_archived=False,
+                                finalized_at__isnull=False,
+                                question__end_date__lt=before)
+        with transaction.atomic():
+            question_ids = list(snapshots.values_list('question_id',
+                                                      flat=True))
+            votes = Vote.objects.filter(question_id__in=question_ids)
+            if stream is not None:
+                serializers.serialize('jsonl',
+                                      votes.order_by('pk').iterator(),
+                                      stream=stream)
+            deleted = votes.delete()[0]
+            self.filter(question_id__in=question_ids).update(
+                votes_archived=True)
+        return deleted
+
+
+class ResultSnapshot(models.Model):
+    """
+    The results of a closed question, frozen by ``finalize_polls``.
+
+    `results` has the same form as `Question.results`. Editing the
+    question or its choices clears `finalized_at`, and the next
+    ``finalize_polls`` refreshes the snapshot. Once `votes_archived` is
+    set the question's votes are gone and its choice counters are the
+    only count left.
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE,
+                                    primary_key=True)
+    results = models.JSONField()
+    finalized_at = models.DateTimeField(null=True)
+    votes_archived = models.BooleanField(default=False)
+
+    objects = ResultSnapshotManager()
@@ -0,0 +1,108 @@
+"""Keyset pagination of questions on (pub_date, id).
+
+Instead of an OFFSET, each page remembers the last question it showed
+and the next page starts right after it, so a deep page costs the same
+index range scan as the first one.
+"""
+import datetime
+
+from django.db.models import Q
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def encode_cursor(question):
+    """
+    The function turns the position of a question into a URL-safe cursor.
+    :param question: The last question of a page.
+    :return: a string value.
+    """
+    return urlsafe_base64_encode(
+        force_bytes(f"{question.pub_date.isoformat()}|{question.pk}"))
+
+
+def decode_cursor(cursor):
+    """
+    The function reads a cursor made by `encode_cursor`.
+    :param cursor: The cursor from the query string, or None.
+    :return: a (pub_date, id) tuple, or None if the cursor is missing or
+        malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        pub_date, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        return datetime.datetime.fromisoformat(pub_date), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """
+    A page of questions, newest first, that starts after a cursor.
+
+    The queryset is only run when the page is first used.
+    """
+
+    def __init__(self, queryset, per_page, cursor=None):
+        """
+        :param queryset: Questions to page through.
+        :param per_page: The number of questions on a page.
+        :param cursor: The cursor of the previous page, if any.
+        """
+        position = decode_cursor(cursor)
+        if position is not None:
+            pub_date, pk = position
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+        self.queryset = queryset.order_by('-pub_date', '-pk')
+        self.per_page = per_page
+        self._loaded = None
+
+    @property
+    def _rows(self):
+        """Fetch one question more than a page to know if there is more."""
+        if self._loaded is None:
+            self._loaded = list(self.queryset[:self.per_page + 1])
+        return self._loaded
+
+    async def aload(self):
+        """
+        The function fetches the page from async code, so that using it
+        afterwards runs no query.
+        """
+        self._loaded = [question async for question
+                        in self.queryset[:self.per_page + 1]]
+
+    @property
+    def object_list(self):
+        return self._rows[:self.per_page]
+
+    @property
+    def has_next(self):
+        return len(self._rows) > self.per_page
+
+    @property
+    def next_cursor(self):
+        """
+        The function returns the cursor of the next page.
+        :return: a string value, or None on the last page.
+        """
+        if self.has_next:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+
+class SinglePage:
+    """
+    The only page of a list that is not paged, such as the most active
+    questions.
+    """
+    has_next = False
+    next_cursor = None
+
+    def __init__(self, object_list):
+        """
+        :param object_list: The questions on the page.
+        """
+        self.object_list = object_list
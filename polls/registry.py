@@ -0,0 +1,116 @@
+"""A process-local registry of the questions open for voting.
+
+`open_polls` keeps every open question and its choices in memory, so the
+vote path and the detail page can check that a question is open and that a
+choice belongs to it without a query. It is loaded on first use and again
+on the first use after the next `pub_date`/`end_date` boundary, which
+opens and closes polls at the exact time without a timer thread.
+
+Saving or deleting a question or a choice bumps `index_version`, and the
+registry reloads whenever that version is not the one it was loaded
+under. The version is only seen by every process when ``CACHES`` is
+shared between them, so the registry is also reloaded at least every
+``POLLS_INDEX_MAX_AGE`` seconds, which bounds how long questions saved
+by another process stay unknown.
+"""
+import datetime
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .caching import index_version
+from .models import Question, Choice
+
+
+class OpenPolls:
+    """The open questions, each with its choices as ``open_choices``."""
+
+    def __init__(self):
+        self._questions = None
+        self._version = None
+        self._expires = None
+        self._lock = threading.Lock()
+
+    def _fresh(self, now, version):
+        return (self._questions is not None and self._version == version
+                and (self._expires is None or now < self._expires))
+
+    def questions(self):
+        """
+        The function returns the questions open for voting right now,
+        reloading them if a question has opened, closed or changed, or if
+        they were loaded ``POLLS_INDEX_MAX_AGE`` seconds ago.
+        :return: a dict of question id to `Question`.
+        """
+        now, version = timezone.now(), index_version()
+        if not self._fresh(now, version):
+            with self._lock:
+                if not self._fresh(now, version):
+                    self._load(now, version)
+        return self._questions
+
+    async def aquestions(self):
+        """Async version of `questions`."""
+        if self._fresh(timezone.now(), index_version()):
+            return self._questions
+        return await sync_to_async(self.questions)()
+
+    def _load(self, now, version):
+        # Read from the primary, as a lagging copy could be kept until the
+        # next boundary.
+        open_questions = (
+            Question.objects.using(DEFAULT_DB_ALIAS).open(now)
+            .prefetch_related(Prefetch(
+                'choice_set', queryset=Choice.objects.order_by('pk'),
+                to_attr='open_choices')))
+        questions = {}
+        for question in open_questions:
+            question.choices_by_id = {choice.pk: choice
+                                      for choice in question.open_choices}
+            questions[question.pk] = question
+        expires = Question.objects.using(DEFAULT_DB_ALIAS).next_boundary(now)
+        if settings.POLLS_INDEX_MAX_AGE:
+            expires = min(filter(None, [expires, now + datetime.timedelta(
+                seconds=settings.POLLS_INDEX_MAX_AGE)]))
+        self._expires = expires
+        self._questions = questions
+        self._version = version
+
+    def get(self, question_id):
+        """
+        The function finds an open question.
+        :return: a `Question`, or None if it is not open or does not exist.
+        """
+        return self.questions().get(_as_id(question_id))
+
+    async def aget(self, question_id):
+        """Async version of `get`."""
+        return (await self.aquestions()).get(_as_id(question_id))
+
+    @staticmethod
+    def choice(question, choice_id):
+        """
+        The function finds one of an open question's choices.
+        :param question: A question returned by `get`.
+        :param choice_id: The id of the choice, as an int or a string.
+        :return: a `Choice`, or None if the question has no such choice.
+        """
+        return question.choices_by_id.get(_as_id(choice_id))
+
+    def clear(self):
+        with self._lock:
+            self._questions = None
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+open_polls = OpenPolls()
@@ -0,0 +1,120 @@
+"""Routing of the polls reads to read-only copies of the database.
+
+With ``POLLS_READ_DATABASES`` set, the polls pages read questions,
+choices and votes from one of those aliases, picked at random. Only the
+GET requests to the polls pages opt in, through `PinPrimaryMiddleware`;
+everything else, including all writes, the admin and management commands
+such as ``rebuild_vote_counts``, uses ``default``. Copies lag behind the
+primary, so the middleware also keeps a browser on the primary for
+``POLLS_REPLICA_LAG`` seconds after it writes anything, which lets users
+see their own votes at once.
+"""
+import contextvars
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import Resolver404, resolve
+
+PIN_COOKIE = 'polls_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# The URL namespace of the pages that may read from a copy
+READ_NAMESPACE = 'polls'
+
+_use_replicas = contextvars.ContextVar('polls_use_replicas', default=False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends the polls reads to ``POLLS_READ_DATABASES`` in the requests that
+    opted in, and every other query to ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (model._meta.app_label != 'polls'
+                or not settings.POLLS_READ_DATABASES
+                or not _use_replicas.get()):
+            return None
+        return random.choice(settings.POLLS_READ_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+class PinPrimaryMiddleware:
+    """
+    Lets the GET requests to the polls pages read from a copy, except
+    during and for ``POLLS_REPLICA_LAG`` seconds after any request that
+    may write, remembered in a cookie. It removes itself from the stack
+    when there are no read databases.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.POLLS_READ_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _use_replicas.set(self.reads_replicas(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replicas.reset(token)
+        return self.remember(request, response)
+
+    async def __acall__(self, request):
+        token = _use_replicas.set(self.reads_replicas(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_replicas.reset(token)
+        return self.remember(request, response)
+
+    @staticmethod
+    def reads_replicas(request):
+        """Whether the request may read the polls from a copy."""
+        if (request.method not in SAFE_METHODS
+                or PIN_COOKIE in request.COOKIES):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return READ_NAMESPACE in match.namespaces
+
+    @staticmethod
+    def remember(request, response):
+        """Pin the browser to the primary after a request that may write."""
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, '1',
+                                max_age=settings.POLLS_REPLICA_LAG,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+def sync_replica(alias, source=DEFAULT_DB_ALIAS):
+    """
+    The function copies an SQLite database over one of its read copies,
+    for trying the routing locally without real replication.
+
+    :param alias: The read database to overwrite.
+    :param source: The database to copy.
+    """
+    connections[source].ensure_connection()
+    connections[alias].ensure_connection()
+    connections[source].connection.backup(connections[alias].connection)
@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .auth import user_cache
+from .broadcast import broadcaster
+from .caching import invalidate_index
+from .models import (Question, Choice, ResultSnapshot, results_cache_key,
+                     votes_changed)
+from .user_votes import warm_user_votes
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=Choice)
+def question_changed(sender, **kwargs):
+    """
+    The function drops the cached poll list and the registry of open polls
+    when a question or a choice is added, edited or deleted.
+    """
+    invalidate_index()
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=Choice)
+def unfreeze_results(sender, instance, **kwargs):
+    """
+    The function marks the results snapshot of an edited question, or of
+    the question of an edited choice, as out of date.
+    """
+    question_id = instance.pk if sender is Question else instance.question_id
+    ResultSnapshot.objects.filter(question_id=question_id,
+                                  finalized_at__isnull=False).update(
+        finalized_at=None)
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=Choice)
+def question_results_changed(sender, instance, **kwargs):
+    """
+    The function drops the cached results of an edited question, or of the
+    question of an edited choice.
+    """
+    question_id = instance.pk if sender is Question else instance.question_id
+    cache.delete(results_cache_key(question_id))
+
+
+@receiver(user_logged_in)
+def user_logged_in_votes(sender, request, user, **kwargs):
+    """
+    The function loads the user's votes into the session on login.
+    """
+    warm_user_votes(request, user)
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    """
+    The function drops a user from this process's cache of logged-in
+    users when it is edited or deleted.
+    """
+    user_cache.discard(instance.pk)
+
+
+@receiver(votes_changed)
+def publish_results(sender, question_ids, **kwargs):
+    """
+    The function sends the new results of each question to its open
+    results streams, computing them once per question.
+    """
+    for question in Question.objects.filter(
+            pk__in=[pk for pk in question_ids
+                    if broadcaster.has_subscribers(pk)]):
+        broadcaster.publish(question.pk, question.results(refresh=True))
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """
+    The function applies the ``SQLITE_PRAGMAS`` setting to each new SQLite
+    connection.
+    """
+    if connection.vendor == 'sqlite':
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            connection.connection.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,90 @@
+"""Tests of the polls admin."""
+import django.test
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from polls.admin import EstimatedCountPaginator
+from polls.models import Question, Choice, Vote
+
+
+class AdminTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(username="admin")
+        self.client.force_login(self.admin)
+        self.question = Question.objects.create(question_text="Admin?")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+
+    def add_votes(self, count):
+        for _ in range(count):
+            user = User.objects.create_user(
+                username=f"voter{Vote.objects.count()}")
+            Vote.objects.record(user, self.choice)
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:polls_{model}_changelist')
+        # The first request may fill the session and user caches.
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        """The changelists make the same queries for 1 or 5 votes."""
+        self.add_votes(1)
+        before = {model: self.changelist_queries(model)
+                  for model in ['question', 'choice', 'vote']}
+        self.add_votes(4)
+        after = {model: self.changelist_queries(model)
+                 for model in ['question', 'choice', 'vote']}
+        self.assertEqual(before, after)
+
+    def test_question_vote_column(self):
+        """Questions show their votes summed from the choice counters."""
+        self.add_votes(3)
+        response = self.client.get(reverse('admin:polls_question_changelist'))
+        self.assertEqual(response.context['cl'].result_list[0].total_votes, 3)
+
+    @override_settings(POLLS_COUNTER_SHARDS=4)
+    def test_vote_columns_count_shards(self):
+        """The vote columns include the votes still in counter shards."""
+        self.add_votes(3)
+        response = self.client.get(reverse('admin:polls_question_changelist'))
+        self.assertEqual(response.context['cl'].result_list[0].total_votes, 3)
+        response = self.client.get(reverse('admin:polls_choice_changelist'))
+        self.assertEqual(
+            response.context['cl'].result_list[0].current_votes, 3)
+        response = self.client.get(reverse('admin:polls_question_change',
+                                           args=(self.question.pk,)))
+        self.assertContains(response, '<p>3</p>', html=True)
+
+    def test_votes_are_read_only(self):
+        """Votes can be viewed but not added, changed or deleted."""
+        self.add_votes(1)
+        vote = Vote.objects.get()
+        response = self.client.get(reverse('admin:polls_vote_change',
+                                           args=(vote.pk,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'name="_save"')
+        response = self.client.get(reverse('admin:polls_vote_add'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_estimated_count(self):
+        """Large unfiltered tables are estimated, filtered ones counted."""
+        self.add_votes(3)
+        Vote.objects.filter(pk__lt=Vote.objects.latest('pk').pk).delete()
+
+        class SmallThreshold(EstimatedCountPaginator):
+            threshold = 1
+
+        votes = Vote.objects.order_by('pk')
+        self.assertEqual(SmallThreshold(votes, 10).count, 3)
+        self.assertEqual(
+            SmallThreshold(votes.filter(choice=self.choice), 10).count, 1)
+        self.assertEqual(EstimatedCountPaginator(votes, 10).count, 1)
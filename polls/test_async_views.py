@@ -0,0 +1,56 @@
+"""Tests of the async views, mounted through this module's URLconf."""
+import django.test
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import include, path, reverse
+
+from polls import async_views
+from polls.models import Question, Choice, Vote
+from polls.urls import build_urlpatterns
+
+urlpatterns = [
+    path('polls/', include((build_urlpatterns(async_views), 'polls'))),
+    path('accounts/', include('django.contrib.auth.urls')),
+]
+
+
+@override_settings(ROOT_URLCONF='polls.test_async_views')
+class AsyncViewsTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="voter",
+                                             password="FatChance!")
+        self.question = Question.objects.create(question_text="Async?")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+
+    async def test_pages(self):
+        """The async index, detail and results pages render."""
+        for name, args in [('polls:index', ()),
+                           ('polls:detail', (self.question.id,)),
+                           ('polls:results', (self.question.id,))]:
+            response = await self.async_client.get(reverse(name, args=args))
+            self.assertContains(response, "Async?", msg_prefix=name)
+
+    async def test_vote_requires_login(self):
+        """An anonymous vote redirects to the login page."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        response = await self.async_client.post(url,
+                                                {"choice": self.choice.id})
+        self.assertRedirects(response, f"{reverse('login')}?next={url}",
+                             fetch_redirect_response=False)
+
+    async def test_vote(self):
+        """A logged-in user can vote through the async view."""
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.post(
+            reverse('polls:vote', args=(self.question.id,)),
+            {"choice": self.choice.id})
+        self.assertRedirects(response,
+                             reverse('polls:results',
+                                     args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        vote = await Vote.objects.aget()
+        self.assertEqual(vote.choice_id, self.choice.id)
@@ -0,0 +1,122 @@
+"""Tests of the cached session and auth profile."""
+from unittest import mock
+
+import django.test
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from polls.auth import user_cache
+from polls.models import Question, Choice
+
+AUTH_MIDDLEWARE = {
+    'default': 'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'production': 'polls.auth.CachedAuthenticationMiddleware',
+}
+
+
+def session_profile(profile):
+    """The settings of a SESSION_PROFILE, whatever the current one is."""
+    return {
+        'SESSION_ENGINE': {
+            'default': 'django.contrib.sessions.backends.db',
+            'production': 'django.contrib.sessions.backends.cached_db',
+        }[profile],
+        'MESSAGE_STORAGE': {
+            'default': 'django.contrib.messages.storage.fallback.'
+                       'FallbackStorage',
+            'production': 'django.contrib.messages.storage.cookie.'
+                          'CookieStorage',
+        }[profile],
+        'MIDDLEWARE': [AUTH_MIDDLEWARE[profile]
+                       if name in AUTH_MIDDLEWARE.values() else name
+                       for name in settings.MIDDLEWARE],
+    }
+
+
+class UserCacheTest(django.test.SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(user_cache.clear)
+
+    @django.test.override_settings(POLLS_USER_CACHE_SIZE=2)
+    def test_least_recently_used_are_dropped(self):
+        """Beyond its size the cache forgets the least recently used user."""
+        for n in range(3):
+            user_cache.set(('session', str(n), 'hash'), User(pk=n))
+            if n == 1:
+                user_cache.get(('session', '0', 'hash'))
+        self.assertIsNotNone(user_cache.get(('session', '0', 'hash')))
+        self.assertIsNone(user_cache.get(('session', '1', 'hash')))
+        self.assertIsNotNone(user_cache.get(('session', '2', 'hash')))
+
+    def test_entries_expire(self):
+        """Users are only cached for POLLS_USER_CACHE_TTL seconds."""
+        with mock.patch('polls.auth.time.monotonic', return_value=100.0):
+            user_cache.set(('session', '1', 'hash'), User(pk=1))
+        with mock.patch('polls.auth.time.monotonic',
+                        return_value=100.0 + settings.POLLS_USER_CACHE_TTL
+                        + 1):
+            self.assertIsNone(user_cache.get(('session', '1', 'hash')))
+
+    def test_users_are_copied(self):
+        """Each request gets its own copy of a cached user."""
+        user_cache.set(('session', '1', 'hash'), User(pk=1, username="a"))
+        user_cache.get(('session', '1', 'hash')).username = "b"
+        self.assertEqual(user_cache.get(('session', '1', 'hash')).username,
+                         "a")
+
+
+@django.test.override_settings(**session_profile('production'))
+class CachedSessionTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User.objects.create_user(username="voter",
+                                             password="secret")
+        self.question = Question.objects.create(question_text="Cached?")
+        Choice.objects.create(question=self.question, choice_text="Yes")
+
+    def queries(self, url):
+        """The queries of the second of two requests to a page."""
+        client = django.test.Client()
+        client.force_login(self.user)
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], self.user)
+        return len(queries)
+
+    def test_saves_session_and_user_queries(self):
+        """
+        A logged-in user costs no session or user query on the index and
+        results pages, two fewer than with the default profile.
+        """
+        pages = [reverse('polls:index'),
+                 reverse('polls:results', args=(self.question.pk,))]
+        cached = [self.queries(url) for url in pages]
+        with django.test.override_settings(**session_profile('default')):
+            default = [self.queries(url) for url in pages]
+        self.assertEqual([d - c for d, c in zip(default, cached)], [2, 2])
+
+    def test_password_change_logs_out(self):
+        """A user who changes their password is not served from the cache."""
+        self.client.force_login(self.user)
+        self.client.get(reverse('polls:index'))
+        self.user.set_password("changed")
+        self.user.save()
+        response = self.client.get(reverse('polls:index'))
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_messages_do_not_touch_the_session(self):
+        """Error messages are kept in a cookie."""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('polls:detail', args=(12345,)))
+        self.assertIn('messages', response.cookies)
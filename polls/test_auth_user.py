@@ -1,8 +1,11 @@
 """Tests of authentication."""
 import django.test
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
-from polls.models import Question, Choice
+from polls.models import Question, Choice, Vote
+from polls.user_votes import SESSION_KEY
 from mysite import settings
 
 
@@ -93,3 +96,27 @@ class UserAuthTest(django.test.TestCase):
         # self.assertRedirects(response, reverse('login') )
         login_with_next = f"{reverse('login')}?next={vote_url}"
         self.assertRedirects(response, login_with_next)
+
+    def test_login_loads_user_votes(self):
+        """Logging in loads the user's votes, so the detail page shows
+        the user's vote without querying the vote table.
+        """
+        choice = self.question.choice_set.first()
+        Vote.objects.record(self.user1, choice)
+        self.client.login(username=self.username, password=self.password)
+        url = reverse('polls:detail', args=[self.question.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context["user_vote"], choice.id)
+        self.assertFalse([query for query in queries
+                          if "polls_vote" in query["sql"]])
+
+    def test_vote_updates_user_votes(self):
+        """Voting updates the user's votes in the session."""
+        self.client.login(username=self.username, password=self.password)
+        choice = self.question.choice_set.last()
+        self.client.post(reverse('polls:vote', args=[self.question.id]),
+                         {"choice": choice.id})
+        self.assertEqual(
+            self.client.session[SESSION_KEY], {str(self.question.id):
+                                               choice.id})
@@ -0,0 +1,70 @@
+"""Tests of the benchmark helpers."""
+import django.test
+from django.contrib.auth.models import User
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.benchmark import (QueryCounter, compare, seed, summarize,
+                             template_contexts, time_renders)
+from polls.models import Question
+
+
+class BenchmarkHelpersTest(django.test.TestCase):
+
+    def test_summarize(self):
+        """The summary has throughput, percentiles and queries per request."""
+        stats = summarize([0.001] * 9 + [0.1], elapsed=1.0, queries=20)
+        self.assertEqual(stats['requests'], 10)
+        self.assertEqual(stats['rps'], 10.0)
+        self.assertEqual(stats['p50_ms'], 1.0)
+        self.assertEqual(stats['p99_ms'], 100.0)
+        self.assertEqual(stats['queries'], 2.0)
+
+    def test_query_counter(self):
+        """The counter sees queries made while it is installed."""
+        with QueryCounter() as counter:
+            list(Question.objects.all())
+            Question.objects.exists()
+        self.assertEqual(counter.count, 2)
+        self.assertNotIn(counter, django.db.connection.execute_wrappers)
+        Question.objects.exists()
+        self.assertEqual(counter.count, 2)
+
+    def test_compare(self):
+        """Only changes beyond the tolerance count as regressions."""
+        old = {'rps': 100.0, 'p95_ms': 10.0, 'queries': 3.0}
+        baseline = {'wsgi index': old, 'wsgi vote': old}
+        results = {
+            'wsgi index': {'rps': 90.0, 'p95_ms': 11.0, 'queries': 3.0},
+            'wsgi vote': {'rps': 70.0, 'p95_ms': 13.0, 'queries': 4.0},
+        }
+        regressions = compare(results, baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(all(message.startswith('wsgi vote')
+                            for message in regressions))
+
+    def test_time_renders(self):
+        """Every polls template renders without making queries."""
+        seed(1, 3, 2, 0)
+        request = RequestFactory().get('/')
+        request.user = User.objects.get()
+        contexts = template_contexts(timezone.now())
+        self.assertEqual(set(contexts), {
+            'polls/index.html', 'polls/question_list.html',
+            'polls/detail.html', 'polls/results.html'})
+        for name, context in contexts.items():
+            stats = time_renders(name, context, request, renders=3)
+            self.assertEqual(stats['requests'], 3, name)
+            self.assertEqual(stats['queries'], 0, name)
+            self.assertGreater(stats['first_ms'], 0, name)
+
+    def test_question_list_links(self):
+        """The question list links to each question's pages."""
+        seed(0, 2, 2, 0)
+        html = template_contexts(timezone.now())['polls/index.html'][
+            'question_list']
+        for question in Question.objects.all():
+            self.assertIn(reverse('polls:detail', args=(question.pk,)), html)
+            self.assertIn(reverse('polls:results', args=(question.pk,)),
+                          html)
@@ -0,0 +1,79 @@
+"""Tests of the bulk results export."""
+import csv
+import datetime
+import io
+import json
+
+import django.test
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.exports import result_rows
+from polls.models import Question, Choice, Vote
+
+
+class ExportResultsTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.old = Question.objects.create(
+            question_text="Old?", pub_date=now - datetime.timedelta(days=30))
+        self.new = Question.objects.create(question_text="New?",
+                                           pub_date=now)
+        self.yes = Choice.objects.create(question=self.old,
+                                         choice_text="Yes")
+        self.no = Choice.objects.create(question=self.old, choice_text="No")
+        Choice.objects.create(question=self.new, choice_text="Maybe")
+        for n, choice in enumerate([self.yes, self.yes, self.no]):
+            user = User.objects.create_user(username=f"voter{n}")
+            Vote.objects.record(user, choice)
+
+    def export(self, *args):
+        out = io.StringIO()
+        call_command('export_results', *args, stdout=out)
+        return out.getvalue()
+
+    def test_single_query(self):
+        """All the rows are read in one query."""
+        with self.assertNumQueries(1):
+            rows = list(result_rows())
+        self.assertEqual(len(rows), 3)
+
+    def test_csv(self):
+        """The CSV has each choice's votes and its question's total."""
+        rows = list(csv.DictReader(io.StringIO(self.export())))
+        self.assertEqual(
+            [(row['choice_text'], row['votes'], row['question_total'])
+             for row in rows],
+            [("Yes", "2", "3"), ("No", "1", "3"), ("Maybe", "0", "0")])
+
+    def test_jsonl(self):
+        """Each JSON line is one choice."""
+        lines = self.export('--format', 'jsonl').splitlines()
+        first = json.loads(lines[0])
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(first['question_id'], self.old.pk)
+        self.assertEqual(first['choice_id'], self.yes.pk)
+        self.assertEqual(first['votes'], 2)
+
+    def test_pub_date_filter(self):
+        """Only questions published in the window are exported."""
+        since = (timezone.now() - datetime.timedelta(days=1)).isoformat()
+        rows = list(csv.DictReader(io.StringIO(
+            self.export('--published-after', since))))
+        self.assertEqual([row['question_text'] for row in rows], ["New?"])
+
+    def test_admin_action(self):
+        """The admin action streams the selected questions as CSV."""
+        admin = User.objects.create_superuser(username="admin")
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:polls_question_changelist'),
+            {'action': 'export_results_csv',
+             '_selected_action': [self.new.pk]})
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row['choice_text'] for row in rows], ["Maybe"])
@@ -0,0 +1,70 @@
+"""Tests of the request instrumentation middleware."""
+import django.test
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import override_settings
+from django.urls import reverse
+
+from polls.instrumentation import (InstrumentationMiddleware, fingerprint,
+                                   install, timings)
+from polls.models import Question, Choice
+
+
+class InstrumentationTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        timings.clear()
+        self.question = Question.objects.create(question_text="Timed?")
+        Choice.objects.create(question=self.question, choice_text="Yes")
+
+    def test_removed_when_disabled(self):
+        """Without the setting the middleware drops out of the stack."""
+        with self.assertRaises(MiddlewareNotUsed):
+            InstrumentationMiddleware(lambda request: None)
+        response = self.client.get(reverse('polls:index'))
+        self.assertNotIn('Server-Timing', response.headers)
+
+    @override_settings(POLLS_INSTRUMENTATION=True)
+    def test_server_timing(self):
+        """Each response carries its total, database and template times."""
+        response = self.client.get(reverse('polls:results',
+                                           args=(self.question.id,)))
+        header = response.headers['Server-Timing']
+        self.assertIn('total;dur=', header)
+        self.assertIn('db;dur=', header)
+        self.assertIn('tpl;dur=', header)
+        summary = timings.summaries()['polls:results']
+        self.assertEqual(summary['count'], 1)
+        self.assertGreater(summary['queries'], 0)
+        self.assertGreater(summary['render_ms'], 0)
+
+    @override_settings(POLLS_INSTRUMENTATION=True,
+                       ROOT_URLCONF='polls.test_async_views')
+    async def test_async_views(self):
+        """Queries of the async views are counted too."""
+        # The async views query through this thread's connection, which
+        # was opened before the middleware hooked into new connections.
+        await sync_to_async(install)()
+        response = await self.async_client.get(
+            reverse('polls:detail', args=(self.question.id,)))
+        self.assertIn('Server-Timing', response.headers)
+        self.assertGreater(timings.summaries()['polls:detail']['queries'], 0)
+
+    def test_fingerprint(self):
+        """Queries that differ only in their IN lists look the same."""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            fingerprint('SELECT *  FROM t\nWHERE id IN (%s)'))
+
+    @override_settings(POLLS_INSTRUMENTATION=True)
+    def test_stats_page_is_staff_only(self):
+        """Only staff can see the stats page."""
+        self.client.get(reverse('polls:index'))
+        response = self.client.get(reverse('polls:stats'))
+        self.assertEqual(response.status_code, 302)
+        staff = User.objects.create_user(username="staff", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('polls:stats'))
+        self.assertContains(response, 'polls:index')
@@ -0,0 +1,99 @@
+"""Tests of the streaming fixture loader."""
+import io
+import json
+import tempfile
+from pathlib import Path
+
+import django.test
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+
+from polls.management.commands.load_polls import iter_json_array
+from polls.models import Question, Choice, Vote
+
+FIXTURE = [
+    {"model": "auth.user", "pk": 7,
+     "fields": {"username": "loader", "password": "",
+                "date_joined": "2023-09-01T00:00:00Z"}},
+    {"model": "polls.question", "pk": 3,
+     "fields": {"question_text": "Loaded?",
+                "pub_date": "2023-09-01T00:00:00Z", "end_date": None}},
+    {"model": "polls.choice", "pk": 5,
+     "fields": {"question": 3, "choice_text": "Yes"}},
+    {"model": "polls.choice", "pk": 6,
+     "fields": {"question": 3, "choice_text": "No"}},
+    # A vote from a fixture written before votes had a question.
+    {"model": "polls.vote", "pk": 1, "fields": {"choice": 6, "user": 7}},
+]
+
+
+class LoadPollsTest(django.test.TestCase):
+
+    def load(self, content, suffix, *args):
+        """Write a fixture to a temporary file and load it."""
+        with tempfile.TemporaryDirectory() as folder:
+            fixture = Path(folder, f"fixture{suffix}")
+            fixture.write_text(content)
+            call_command('load_polls', fixture, *args, stdout=io.StringIO())
+
+    def assert_loaded(self):
+        self.assertTrue(User.objects.filter(username="loader").exists())
+        self.assertEqual(Question.objects.get(pk=3).question_text, "Loaded?")
+        vote = Vote.objects.get(pk=1)
+        self.assertEqual(vote.question_id, 3)
+        self.assertEqual(Choice.objects.get(pk=6).votes, 1)
+        self.assertEqual(Choice.objects.get(pk=5).votes, 0)
+
+    def test_json_array(self):
+        """A loaddata fixture is loaded, filling in the vote's question."""
+        self.load(json.dumps(FIXTURE, indent=2), ".json")
+        self.assert_loaded()
+
+    def test_json_lines_in_small_chunks(self):
+        """JSON lines are loaded across several transactions."""
+        lines = "\n".join(json.dumps(obj) for obj in FIXTURE)
+        self.load(lines, ".jsonl", "--chunk-size", "2", "--batch-size", "1")
+        self.assert_loaded()
+
+    def test_loading_twice_updates_rows(self):
+        """Loading a fixture again updates rows instead of duplicating."""
+        self.load(json.dumps(FIXTURE), ".json")
+        changed = json.loads(json.dumps(FIXTURE))
+        changed[1]["fields"]["question_text"] = "Reloaded?"
+        self.load(json.dumps(changed), ".json")
+        self.assertEqual(Question.objects.get(pk=3).question_text,
+                         "Reloaded?")
+        self.assertEqual(Vote.objects.count(), 1)
+        self.assertEqual(Choice.objects.get(pk=6).votes, 1)
+
+    def test_duplicate_votes(self):
+        """Only the last vote of a user on a question is kept."""
+        fixture = FIXTURE + [
+            {"model": "polls.vote", "pk": 2, "fields": {"choice": 5,
+                                                        "user": 7}}]
+        lines = "\n".join(json.dumps(obj) for obj in fixture)
+        self.load(lines, ".jsonl")
+        self.assertEqual(Vote.objects.get().choice_id, 5)
+        # The same vote under another id, in another chunk, is updated.
+        self.load(lines, ".jsonl", "--chunk-size", "5")
+        vote = Vote.objects.get()
+        self.assertEqual((vote.pk, vote.choice_id), (2, 5))
+        self.assertEqual(Choice.objects.get(pk=5).votes, 1)
+        self.assertEqual(Choice.objects.get(pk=6).votes, 0)
+
+    def test_unknown_model(self):
+        """Objects of other models are refused."""
+        with self.assertRaises(CommandError):
+            self.load(json.dumps([{"model": "auth.group", "pk": 1,
+                                   "fields": {"name": "x"}}]), ".json")
+
+    def test_array_parser_reads_in_pieces(self):
+        """The array parser yields every object with a tiny read size."""
+        stream = io.StringIO(json.dumps(FIXTURE, indent=2))
+        self.assertEqual(list(iter_json_array(stream, read_size=7)), FIXTURE)
+
+    def test_truncated_array(self):
+        """A truncated array is an error rather than a short load."""
+        stream = io.StringIO(json.dumps(FIXTURE)[:-20])
+        with self.assertRaises(CommandError):
+            list(iter_json_array(stream, read_size=16))
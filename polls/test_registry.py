@@ -0,0 +1,116 @@
+"""Tests of the registry of open polls."""
+import datetime
+from unittest import mock
+
+import django.test
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.caching import invalidate_index
+from polls.models import Question, Choice, Vote
+from polls.registry import open_polls
+from polls.tests import create_question
+
+
+class OpenPollsTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(open_polls.clear)
+        self.question = create_question("Open?", days_offset=-1)
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+
+    def test_open_questions_and_choices(self):
+        """Only open questions are found, with their own choices."""
+        closed = create_question("Closed?", days_offset=-2, days_end=-1)
+        future = create_question("Future?", days_offset=1)
+        self.assertEqual(set(open_polls.questions()), {self.question.pk})
+        self.assertIsNone(open_polls.get(closed.pk))
+        self.assertIsNone(open_polls.get(future.pk))
+        question = open_polls.get(str(self.question.pk))
+        self.assertEqual(open_polls.choice(question, str(self.choice.pk)),
+                         self.choice)
+        self.assertIsNone(open_polls.choice(question, "nope"))
+        self.assertIsNone(open_polls.get("nope"))
+
+    @override_settings(POLLS_INDEX_MAX_AGE=0)
+    def test_reloads_at_the_next_boundary(self):
+        """A question closes exactly when its end date passes."""
+        now = timezone.now()
+        self.question.end_date = now + datetime.timedelta(hours=1)
+        self.question.save()
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            self.assertIsNotNone(open_polls.get(self.question.pk))
+        with self.assertNumQueries(0), mock.patch(
+                'django.utils.timezone.now',
+                return_value=self.question.end_date
+                - datetime.timedelta(microseconds=1)):
+            self.assertIsNotNone(open_polls.get(self.question.pk))
+        with mock.patch('django.utils.timezone.now',
+                        return_value=self.question.end_date):
+            self.assertIsNotNone(open_polls.get(self.question.pk))
+        with mock.patch(
+                'django.utils.timezone.now',
+                return_value=self.question.end_date
+                + datetime.timedelta(microseconds=1)):
+            self.assertIsNone(open_polls.get(self.question.pk))
+
+    def test_reloads_after_changes(self):
+        """Edits, including bulk ones followed by an invalidation, show up."""
+        open_polls.questions()
+        self.question.end_date = timezone.now() - datetime.timedelta(days=1)
+        self.question.save()
+        self.assertIsNone(open_polls.get(self.question.pk))
+        question = create_question("New?", days_offset=-1)
+        self.assertIsNotNone(open_polls.get(question.pk))
+        Choice.objects.bulk_create([Choice(question=question,
+                                           choice_text="Bulk")])
+        invalidate_index()
+        self.assertEqual(len(open_polls.get(question.pk).open_choices), 1)
+
+    def test_reloads_after_max_age(self):
+        """Questions saved unseen, as by another process, show up in time."""
+        open_polls.questions()
+        now = timezone.now()
+        [question] = Question.objects.bulk_create([Question(
+            question_text="Elsewhere?",
+            pub_date=now - datetime.timedelta(days=1))])
+        self.assertIsNone(open_polls.get(question.pk))
+        later = now + datetime.timedelta(
+            seconds=settings.POLLS_INDEX_MAX_AGE + 1)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertIsNotNone(open_polls.get(question.pk))
+
+    def test_vote_without_question_queries(self):
+        """Voting reads neither the question nor the choice."""
+        user = User.objects.create_user(username="voter")
+        self.client.force_login(user)
+        url = reverse('polls:vote', args=(self.question.pk,))
+        self.client.post(url, {'choice': self.choice.pk})
+        Vote.objects.all().delete()
+        self.client.post(url, {'choice': self.choice.pk})
+        self.assertEqual(Vote.objects.get().choice, self.choice)
+        with django.test.utils.CaptureQueriesContext(
+                django.db.connection) as queries:
+            self.client.post(url, {'choice': self.choice.pk})
+        self.assertFalse(any('"polls_question"' in query['sql']
+                             or 'FROM "polls_choice"' in query['sql']
+                             for query in queries))
+
+    def test_closed_and_unknown_votes(self):
+        """Closed questions send voters to log in, unknown ones are 404."""
+        user = User.objects.create_user(username="voter")
+        self.client.force_login(user)
+        closed = create_question("Closed?", days_offset=-2, days_end=-1)
+        response = self.client.post(reverse('polls:vote', args=(closed.pk,)),
+                                    {'choice': 1})
+        self.assertRedirects(response, reverse('login'))
+        response = self.client.post(reverse('polls:vote', args=(12345,)),
+                                    {'choice': 1})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Vote.objects.exists())
+        self.assertTrue(Question.objects.filter(pk=closed.pk).exists())
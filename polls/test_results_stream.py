@@ -0,0 +1,94 @@
+"""Tests of live results streams."""
+import asyncio
+import datetime
+import json
+import threading
+from unittest import mock
+
+import django.test
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.broadcast import ResultsBroadcaster, broadcaster
+from polls.models import Question, Choice, Vote
+
+
+class ResultsBroadcasterTest(django.test.SimpleTestCase):
+
+    def test_publish_from_another_thread(self):
+        """Results published from a worker thread reach the subscriber."""
+        hub = ResultsBroadcaster()
+
+        async def watch():
+            queue = hub.subscribe(1)
+            thread = threading.Thread(target=hub.publish, args=(1, "new"))
+            thread.start()
+            result = await asyncio.wait_for(queue.get(), 1)
+            thread.join()
+            hub.unsubscribe(1, queue)
+            return result
+
+        self.assertEqual(asyncio.run(watch()), "new")
+        self.assertFalse(hub.has_subscribers(1))
+
+    def test_slow_subscriber_gets_latest(self):
+        """A subscriber that falls behind only sees the newest results."""
+        hub = ResultsBroadcaster()
+
+        async def watch():
+            queue = hub.subscribe(1)
+            hub.publish(1, "old")
+            hub.publish(1, "new")
+            await asyncio.sleep(0)
+            return queue.qsize(), queue.get_nowait()
+
+        self.assertEqual(asyncio.run(watch()), (1, "new"))
+
+
+class ResultsStreamTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="voter")
+        self.question = Question.objects.create(question_text="Live?")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+
+    def test_vote_publishes_results(self):
+        """Committing a vote publishes the new results once."""
+        with mock.patch.object(broadcaster, 'has_subscribers',
+                               return_value=True), \
+                mock.patch.object(broadcaster, 'publish') as publish, \
+                self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.record(self.user, self.choice)
+        publish.assert_called_once_with(self.question.pk,
+                                        self.question.results())
+
+    def test_stream_under_wsgi_sends_current_results(self):
+        """Without ASGI the stream sends the current results and ends."""
+        url = reverse('polls:results_stream', args=(self.question.id,))
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b"".join(response.streaming_content).decode()
+        data = body.split("data: ", 1)[1]
+        self.assertEqual(json.loads(data), self.question.results())
+
+    def test_closed_poll_is_not_streamed(self):
+        """A closed poll sends its results once and tells the page to stop."""
+        self.question.end_date = timezone.now() - datetime.timedelta(days=1)
+        self.question.save()
+        url = reverse('polls:results_stream', args=(self.question.id,))
+        body = b"".join(self.client.get(url).streaming_content).decode()
+        self.assertTrue(body.endswith("event: close\ndata: closed\n\n"))
+
+    @override_settings(POLLS_STREAM_LIFETIME=0.2, POLLS_STREAM_KEEPALIVE=0.05)
+    async def test_stream_ends_after_its_lifetime(self):
+        """An ASGI stream ends on its own and drops its subscription."""
+        url = reverse('polls:results_stream', args=(self.question.id,))
+        response = await self.async_client.get(url)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(chunks[0], b"retry: 5000\n")
+        self.assertIn(b": keep-alive\n\n", chunks)
+        self.assertFalse(broadcaster.has_subscribers(self.question.pk))
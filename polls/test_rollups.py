@@ -0,0 +1,114 @@
+"""Tests of the hourly vote rollups and the most active polls."""
+import datetime
+import io
+
+import django.test
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question, Choice, Vote, VoteRollup, hour_of
+
+
+class VoteRollupTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.question = Question.objects.create(question_text="Rolled up?")
+        self.choices = [Choice.objects.create(question=self.question,
+                                              choice_text=f"Choice {n}")
+                        for n in range(2)]
+        self.users = [User.objects.create_user(username=f"voter{n}")
+                      for n in range(3)]
+
+    def rollup_counts(self):
+        """Return the summed rollups of each choice and hour."""
+        return {(row['choice'], row['hour']): row['total'] for row in
+                VoteRollup.objects.values('choice', 'hour')
+                .annotate(total=Sum('count')).filter(total__gt=0)}
+
+    def test_votes_are_rolled_up(self):
+        """Each vote counts in the hour it was cast."""
+        for user in self.users:
+            Vote.objects.record(user, self.choices[0])
+        self.assertEqual(self.rollup_counts(),
+                         {(self.choices[0].pk, hour_of(timezone.now())): 3})
+
+    def test_moved_vote_leaves_its_old_hour(self):
+        """Moving a vote takes it from its old choice and hour."""
+        Vote.objects.record(self.users[0], self.choices[0])
+        earlier = timezone.now() - datetime.timedelta(hours=3)
+        Vote.objects.update(created_at=earlier)
+        VoteRollup.objects.rebuild()
+        Vote.objects.record(self.users[0], self.choices[1])
+        self.assertEqual(self.rollup_counts(),
+                         {(self.choices[1].pk, hour_of(timezone.now())): 1})
+        self.assertGreater(Vote.objects.get().created_at, earlier)
+
+    def test_one_row_per_choice_and_hour(self):
+        """Votes update their hour's row instead of adding rows."""
+        for user in self.users:
+            Vote.objects.record(user, self.choices[0])
+        Vote.objects.record(self.users[0], self.choices[1])
+        self.assertEqual(
+            sorted(VoteRollup.objects.values_list('choice', 'count')),
+            [(self.choices[0].pk, 2), (self.choices[1].pk, 1)])
+
+    def test_compact(self):
+        """Compaction drops the hours whose votes all moved away."""
+        Vote.objects.record(self.users[0], self.choices[0])
+        Vote.objects.record(self.users[0], self.choices[1])
+        before = self.rollup_counts()
+        call_command('compact_rollups', stdout=io.StringIO())
+        self.assertEqual(self.rollup_counts(), before)
+        self.assertEqual(VoteRollup.objects.count(), 1)
+        self.assertFalse(VoteRollup.objects.filter(count__lte=0).exists())
+
+    def test_rebuild_matches_writes(self):
+        """Recounting from the votes gives the same counts."""
+        for user in self.users:
+            Vote.objects.record(user, self.choices[0])
+        Vote.objects.record(self.users[1], self.choices[1])
+        before = self.rollup_counts()
+        VoteRollup.objects.rebuild()
+        self.assertEqual(self.rollup_counts(), before)
+
+
+class MostActiveTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.quiet = Question.objects.create(
+            question_text="Quiet?", pub_date=now - datetime.timedelta(days=2))
+        self.busy = Question.objects.create(
+            question_text="Busy?", pub_date=now - datetime.timedelta(days=1))
+        self.stale = Question.objects.create(
+            question_text="Stale?", pub_date=now - datetime.timedelta(days=3))
+        for question, voters in [(self.quiet, 1), (self.busy, 3),
+                                 (self.stale, 2)]:
+            choice = Choice.objects.create(question=question,
+                                           choice_text="Yes")
+            for n in range(voters):
+                user, _ = User.objects.get_or_create(username=f"voter{n}")
+                Vote.objects.record(user, choice)
+        VoteRollup.objects.filter(question=self.stale).update(
+            hour=hour_of(now - datetime.timedelta(days=2)))
+
+    def test_most_active_first(self):
+        """Questions are ranked by their votes in the last day."""
+        response = self.client.get(reverse('polls:index'),
+                                   {'order': 'active'})
+        self.assertQuerysetEqual(response.context['latest_question_list'],
+                                 [self.busy, self.quiet])
+
+    @override_settings(ROOT_URLCONF='polls.test_async_views')
+    async def test_async_most_active(self):
+        """The async index ranks questions the same way."""
+        response = await self.async_client.get(reverse('polls:index'),
+                                               {'order': 'active'})
+        self.assertEqual(response.context['latest_question_list'],
+                         [self.busy, self.quiet])
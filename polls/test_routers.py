@@ -0,0 +1,164 @@
+"""Tests of the read-replica routing.
+
+The tests that read stale data need two databases, so they only run with
+the local two-file setup::
+
+    python manage.py test polls.test_routers --settings=mysite.settings_replicas
+"""
+import json
+import unittest
+
+import django.test
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from polls.caching import _timeout_until
+from polls.models import Question, Choice, Vote
+from polls.routers import (PIN_COOKIE, PinPrimaryMiddleware,
+                           PrimaryReplicaRouter, _use_replicas,
+                           sync_replica)
+from polls.user_votes import SESSION_KEY
+
+
+@override_settings(POLLS_READ_DATABASES=['replica'])
+class RouterTest(django.test.SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.router = PrimaryReplicaRouter()
+
+    def use_replicas(self):
+        token = _use_replicas.set(True)
+        self.addCleanup(_use_replicas.reset, token)
+
+    def test_polls_reads_go_to_replicas(self):
+        """Polls models are read from a replica, other apps from default."""
+        self.use_replicas()
+        self.assertEqual(self.router.db_for_read(Question), 'replica')
+        self.assertEqual(self.router.db_for_read(Choice), 'replica')
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(self.router.db_for_write(Question), 'default')
+
+    def test_reads_outside_requests_go_to_primary(self):
+        """Management commands and other code read from the primary."""
+        self.assertIsNone(self.router.db_for_read(Question))
+
+    @override_settings(POLLS_READ_DATABASES=[])
+    def test_no_replicas(self):
+        self.use_replicas()
+        self.assertIsNone(self.router.db_for_read(Question))
+
+    def test_cached_list_expires_within_lag(self):
+        """A poll list read from a copy is cached for at most the lag."""
+        self.assertEqual(_timeout_until(None), settings.POLLS_REPLICA_LAG)
+
+    def run_middleware(self, request):
+        """Return whether the view was pinned, and the response."""
+        seen = []
+        middleware = PinPrimaryMiddleware(
+            lambda request: seen.append(not _use_replicas.get())
+            or HttpResponse())
+        response = middleware(request)
+        return seen[0], response
+
+    def test_post_pins_to_primary(self):
+        """A POST reads from the primary and pins the following requests."""
+        factory = RequestFactory()
+        pinned, response = self.run_middleware(factory.get('/polls/'))
+        self.assertFalse(pinned)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        pinned, response = self.run_middleware(factory.post('/polls/1/vote/'))
+        self.assertTrue(pinned)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'],
+                         settings.POLLS_REPLICA_LAG)
+
+        request = factory.get('/polls/1/results/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        pinned, response = self.run_middleware(request)
+        self.assertTrue(pinned)
+
+    def test_only_polls_pages_read_replicas(self):
+        """The admin and unknown URLs read from the primary."""
+        factory = RequestFactory()
+        self.assertFalse(self.run_middleware(factory.get('/polls/1/'))[0])
+        self.assertTrue(self.run_middleware(factory.get('/admin/'))[0])
+        self.assertTrue(self.run_middleware(factory.get('/nowhere/'))[0])
+
+
+@unittest.skipUnless('replica' in settings.POLLS_READ_DATABASES,
+                     "needs --settings=mysite.settings_replicas")
+class ReplicaRoutingTest(django.test.TransactionTestCase):
+    databases = {'default', *settings.POLLS_READ_DATABASES}
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Replicated?")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="Yes")
+
+    def test_pages_read_stale_replica(self):
+        """The index shows new questions only once the replica is synced."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertNotContains(response, "Replicated?")
+        sync_replica('replica')
+        # The list cached from the stale copy expires within the lag.
+        cache.clear()
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "Replicated?")
+
+    def test_voter_sees_own_vote(self):
+        """After voting, the voter reads the results from the primary."""
+        sync_replica('replica')
+        user = User.objects.create_user(username="voter")
+        self.client.force_login(user)
+        results = reverse('polls:results_json', args=(self.question.id,))
+        self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                         {'choice': self.choice.id})
+        self.assertEqual(self.client.get(results).json()['total'], 1)
+        # Other browsers still read the stale replica.
+        self.assertEqual(django.test.Client().get(results).json()['total'],
+                         0)
+
+    def test_voter_vote_map_reads_primary(self):
+        """The session vote map is loaded from the primary, not a copy."""
+        sync_replica('replica')
+        user = User.objects.create_user(username="voter")
+        self.client.force_login(user)
+        Vote.objects.create(question=self.question, choice=self.choice,
+                            user=user)
+        session = self.client.session
+        del session[SESSION_KEY]
+        session.save()
+        response = self.client.get(reverse('polls:detail',
+                                           args=(self.question.id,)))
+        self.assertEqual(response.context['user_vote'], self.choice.id)
+
+    def test_batch_vote_shows_to_voter(self):
+        """A relayed vote shows on the voter's next page, before syncing."""
+        sync_replica('replica')
+        voter = User.objects.create_user(username="voter")
+        self.client.force_login(voter)
+        detail = reverse('polls:detail', args=(self.question.id,))
+        self.assertIsNone(self.client.get(detail).context['user_vote'])
+
+        gateway = User.objects.create_user(username="gateway")
+        gateway.user_permissions.add(
+            Permission.objects.get(codename='add_vote'))
+        relay = django.test.Client()
+        relay.force_login(gateway)
+        relay.post(reverse('polls:vote_batch'),
+                   json.dumps({'votes': [{'user': voter.pk,
+                                          'question': self.question.pk,
+                                          'choice': self.choice.pk}]}),
+                   content_type='application/json')
+
+        response = self.client.get(detail)
+        self.assertEqual(response.context['user_vote'], self.choice.id)
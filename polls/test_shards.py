@@ -0,0 +1,127 @@
+"""Tests of the sharded vote counters."""
+import io
+
+import django.test
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from polls.benchmark import WriteTimer
+from polls.exports import result_rows
+from polls.models import Choice, ChoiceCounterShard, ResultSnapshot, Vote
+from polls.tests import create_question
+
+
+@override_settings(POLLS_COUNTER_SHARDS=4)
+class CounterShardTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.question = create_question("Sharded?", days_offset=-1)
+        self.yes = Choice.objects.create(question=self.question,
+                                         choice_text="Yes")
+        self.no = Choice.objects.create(question=self.question,
+                                        choice_text="No")
+        self.users = [User.objects.create_user(username=f"voter{n}")
+                      for n in range(6)]
+        for user in self.users:
+            Vote.objects.record(user, self.yes)
+
+    def votes(self):
+        return {choice['id']: choice['votes']
+                for choice in self.question.results()['choices']}
+
+    def test_votes_go_to_shards(self):
+        """Votes update the voter's shard and leave the counter alone."""
+        self.yes.refresh_from_db()
+        self.assertEqual(self.yes.vote_count, 0)
+        shards = dict(ChoiceCounterShard.objects.filter(choice=self.yes)
+                      .values_list('shard', 'count'))
+        self.assertEqual(sum(shards.values()), 6)
+        self.assertLessEqual(set(shards), set(range(4)))
+        self.assertEqual(self.votes(), {self.yes.pk: 6, self.no.pk: 0})
+
+    def test_choice_votes(self):
+        """A choice's votes include its shards."""
+        self.assertEqual(Choice.objects.get(pk=self.yes.pk).votes, 6)
+        self.assertEqual(self.yes.get_vote_count(), 6)
+        choice = Choice.objects.with_votes().get(pk=self.yes.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(choice.votes, 6)
+
+    def test_changed_vote(self):
+        """A changed vote moves between the shards of the voter."""
+        Vote.objects.record(self.users[0], self.no)
+        self.assertEqual(self.votes(), {self.yes.pk: 5, self.no.pk: 1})
+        self.assertEqual(Choice.objects.rebuild_vote_counts(commit=False), [])
+
+    def test_results_cached(self):
+        """Votes do not drop the cached results, which expire instead."""
+        self.question.results()
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.record(self.users[0], self.no)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.votes(), {self.yes.pk: 6, self.no.pk: 0})
+        self.assertEqual(self.question.results(refresh=True)['choices'][1]
+                         ['votes'], 1)
+        self.assertEqual(self.votes(), {self.yes.pk: 5, self.no.pk: 1})
+
+    def test_edit_drops_cached_results(self):
+        self.question.results()
+        self.yes.choice_text = "Sure"
+        self.yes.save()
+        self.assertEqual(self.question.results()['choices'][0]['text'],
+                         "Sure")
+
+    def test_merge(self):
+        """Merging moves the shards into the counters, keeping the total."""
+        self.assertEqual(ChoiceCounterShard.objects.merge(), 4)
+        self.yes.refresh_from_db()
+        self.assertEqual(self.yes.vote_count, 6)
+        self.assertFalse(ChoiceCounterShard.objects.exclude(count=0).exists())
+        Vote.objects.record(self.users[0], self.no)
+        cache.clear()
+        self.assertEqual(self.votes(), {self.yes.pk: 5, self.no.pk: 1})
+        self.assertEqual(ChoiceCounterShard.objects.merge(), 2)
+
+    def test_merge_command(self):
+        out = io.StringIO()
+        call_command('merge_counters', stdout=out)
+        self.assertEqual(out.getvalue(), "Merged 4 counter shards.\n")
+
+    def test_rebuild(self):
+        """Rebuilding counts the shards and clears them when wrong."""
+        ChoiceCounterShard.objects.filter(choice=self.yes).update(count=0)
+        self.assertEqual(Choice.objects.rebuild_vote_counts(),
+                         [(self.yes.pk, 0, 6)])
+        self.assertFalse(
+            ChoiceCounterShard.objects.filter(choice=self.yes).exists())
+        cache.clear()
+        self.assertEqual(self.votes(), {self.yes.pk: 6, self.no.pk: 0})
+
+    def test_snapshot_and_export(self):
+        """Snapshots and exports include the votes still in shards."""
+        self.question.end_date = self.question.pub_date
+        self.question.save()
+        ResultSnapshot.objects.finalize(timezone.now())
+        self.assertEqual(self.question.frozen_results()['total'], 6)
+        # Exports only read, and count shards left after turning them off.
+        with self.settings(POLLS_COUNTER_SHARDS=0), \
+                self.assertNumQueries(1):
+            rows = list(result_rows())
+        self.assertEqual({row[4]: row[6:] for row in rows},
+                         {self.yes.pk: (6, 6), self.no.pk: (0, 6)})
+
+
+class WriteTimerTest(django.test.TestCase):
+
+    def test_times_writes(self):
+        with WriteTimer() as timer:
+            list(User.objects.all())
+            self.assertEqual(timer.seconds, 0)
+            User.objects.create_user(username="writer")
+        self.assertGreater(timer.seconds, 0)
+        self.assertGreaterEqual(timer.count, 2)
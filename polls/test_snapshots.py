@@ -0,0 +1,127 @@
+"""Tests of the frozen results of closed polls."""
+import datetime
+import io
+import json
+import tempfile
+from pathlib import Path
+
+import django.test
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question, Choice, Vote, VoteRollup, ResultSnapshot
+from polls.tests import create_question
+
+
+class ResultSnapshotTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.question = create_question("Closed?", days_offset=-10,
+                                        days_end=-5)
+        self.yes = Choice.objects.create(question=self.question,
+                                         choice_text="Yes")
+        self.no = Choice.objects.create(question=self.question,
+                                        choice_text="No")
+        for n in range(3):
+            user = User.objects.create_user(username=f"voter{n}")
+            Vote.objects.record(user, self.yes if n else self.no)
+        self.open = create_question("Open?", days_offset=-1)
+
+    def test_finalize_closed_questions(self):
+        """Only questions closed before the cutoff are frozen, once."""
+        self.assertEqual(ResultSnapshot.objects.finalize(timezone.now()), 1)
+        snapshot = ResultSnapshot.objects.get()
+        self.assertEqual(snapshot.question, self.question)
+        self.assertEqual(snapshot.results, self.question.results())
+        self.assertEqual(snapshot.results['total'], 3)
+        self.assertEqual(ResultSnapshot.objects.finalize(timezone.now()), 0)
+
+    def test_grace_period(self):
+        """A question is not frozen until its grace period has passed."""
+        cutoff = self.question.end_date - datetime.timedelta(seconds=1)
+        self.assertEqual(ResultSnapshot.objects.finalize(cutoff), 0)
+
+    def test_results_served_from_snapshot(self):
+        """Finalized results need no choice query and may be cached."""
+        url = reverse('polls:results', args=(self.question.pk,))
+        json_url = reverse('polls:results_json', args=(self.question.pk,))
+        with django.test.utils.CaptureQueriesContext(
+                django.db.connection) as live:
+            self.client.get(json_url)
+        ResultSnapshot.objects.finalize(timezone.now())
+        with django.test.utils.CaptureQueriesContext(
+                django.db.connection) as frozen:
+            response = self.client.get(json_url)
+        self.assertEqual(len(frozen), len(live) - 1)
+        self.assertEqual(response.json(), self.question.results())
+        self.assertNotIn('Cache-Control', response)
+        with self.settings(POLLS_SNAPSHOT_MAX_AGE=3600):
+            response = self.client.get(json_url)
+            self.assertIn('public', response['Cache-Control'])
+            self.assertIn('max-age=3600', response['Cache-Control'])
+            response = self.client.get(url)
+            self.assertIn('private', response['Cache-Control'])
+            response = self.client.get(
+                reverse('polls:results_json', args=(self.open.pk,)))
+            self.assertNotIn('Cache-Control', response)
+
+    def test_edits_refresh_the_snapshot(self):
+        """Editing a finalized question or its choices unfreezes it."""
+        ResultSnapshot.objects.finalize(timezone.now())
+        self.no.choice_text = "Nope"
+        self.no.save()
+        question = Question.objects.select_related('resultsnapshot').get(
+            pk=self.question.pk)
+        self.assertIsNone(question.frozen_results())
+        self.assertEqual(ResultSnapshot.objects.finalize(timezone.now()), 1)
+        self.assertEqual(
+            ResultSnapshot.objects.get().results['choices'][1]['text'],
+            "Nope")
+        self.question.end_date = None
+        self.question.save()
+        self.assertEqual(ResultSnapshot.objects.finalize(timezone.now()), 0)
+        self.assertIsNone(ResultSnapshot.objects.get().finalized_at)
+
+    def test_archive_votes(self):
+        """Archived votes are written out and deleted, counts survive."""
+        ResultSnapshot.objects.finalize(timezone.now())
+        stream = io.StringIO()
+        cutoff = timezone.now() - datetime.timedelta(days=1)
+        self.assertEqual(
+            ResultSnapshot.objects.archive_votes(cutoff, stream), 3)
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(len(stream.getvalue().splitlines()), 3)
+        self.assertEqual(
+            json.loads(stream.getvalue().splitlines()[0])['model'],
+            'polls.vote')
+        self.assertEqual(Choice.objects.rebuild_vote_counts(), [])
+        VoteRollup.objects.rebuild()
+        self.assertEqual(self.question.results()['total'], 3)
+        self.assertEqual(VoteRollup.objects.aggregate(
+            total=django.db.models.Sum('count'))['total'], 3)
+        self.assertEqual(ResultSnapshot.objects.archive_votes(cutoff), 0)
+
+    def test_only_old_finalized_polls_are_archived(self):
+        """Votes of polls not finalized or closed recently are kept."""
+        cutoff = timezone.now() - datetime.timedelta(days=1)
+        self.assertEqual(ResultSnapshot.objects.archive_votes(cutoff), 0)
+        ResultSnapshot.objects.finalize(timezone.now())
+        cutoff = timezone.now() - datetime.timedelta(days=6)
+        self.assertEqual(ResultSnapshot.objects.archive_votes(cutoff), 0)
+        self.assertEqual(Vote.objects.count(), 3)
+
+    def test_command(self):
+        """The command finalizes and archives, and load_polls reloads."""
+        with tempfile.TemporaryDirectory() as folder:
+            archive = Path(folder, 'votes.jsonl')
+            out = io.StringIO()
+            call_command('finalize_polls', archive_votes=1,
+                         archive_to=str(archive), stdout=out)
+            self.assertIn("Finalized 1 polls.", out.getvalue())
+            self.assertIn("Archived 3 votes.", out.getvalue())
+            call_command('load_polls', str(archive), stdout=io.StringIO())
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assertEqual(self.question.results()['total'], 3)
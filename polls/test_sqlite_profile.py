@@ -0,0 +1,33 @@
+"""Tests of the SQLite production profile."""
+import django.test
+from django.db import connection
+from django.test import override_settings
+
+from mysite.sqlite3.base import DatabaseWrapper
+from polls.signals import tune_sqlite
+
+
+class SQLiteProfileTest(django.test.TestCase):
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -1234})
+    def test_pragmas_applied(self):
+        """The configured PRAGMAs run on new connections."""
+        tune_sqlite(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(cursor.fetchone()[0], -1234)
+
+    def test_immediate_transactions(self):
+        """With transaction_mode, transactions take the write lock."""
+        settings_dict = {**connection.settings_dict, 'NAME': ':memory:',
+                         'OPTIONS': {'transaction_mode': 'IMMEDIATE'}}
+        wrapper = DatabaseWrapper(settings_dict)
+        try:
+            wrapper.ensure_connection()
+            executed = []
+            with wrapper.execute_wrapper(
+                    lambda execute, sql, *args: executed.append(sql)):
+                wrapper._start_transaction_under_autocommit()
+            self.assertEqual(executed, ["BEGIN IMMEDIATE"])
+        finally:
+            wrapper.close()
@@ -0,0 +1,121 @@
+"""Tests of the batch vote endpoint."""
+import json
+
+import django.test
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from polls.models import Choice, Vote
+from polls.tests import create_question
+
+
+class VoteBatchTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.gateway = User.objects.create_user(username="gateway")
+        self.gateway.user_permissions.add(
+            Permission.objects.get(codename='add_vote'))
+        self.client.force_login(self.gateway)
+        self.voters = [User.objects.create_user(username=f"voter{n}")
+                       for n in range(3)]
+        self.question = create_question("Open?", days_offset=-1)
+        self.yes = Choice.objects.create(question=self.question,
+                                         choice_text="Yes")
+        self.no = Choice.objects.create(question=self.question,
+                                        choice_text="No")
+
+    def send(self, votes):
+        return self.client.post(reverse('polls:vote_batch'),
+                                json.dumps({'votes': votes}),
+                                content_type='application/json')
+
+    def ballot(self, voter, choice, question=None):
+        return {'user': voter.pk,
+                'question': (question or self.question).pk,
+                'choice': choice.pk}
+
+    def test_saves_valid_votes(self):
+        """Valid votes are saved and counted, moving earlier votes."""
+        Vote.objects.record(self.voters[0], self.no)
+        response = self.send([self.ballot(voter, self.yes)
+                              for voter in self.voters])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['accepted'], 3)
+        self.assertEqual(self.question.results()['choices'][0]['votes'], 3)
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assertEqual(Choice.objects.get(pk=self.no.pk).vote_count, 0)
+
+    def test_voter_sees_relayed_vote(self):
+        """A vote sent for a logged-in user shows on their next page."""
+        voter = django.test.Client()
+        voter.force_login(self.voters[0])
+        detail = reverse('polls:detail', args=(self.question.pk,))
+        voter.post(reverse('polls:vote', args=(self.question.pk,)),
+                   {'choice': self.no.pk})
+        self.assertEqual(voter.get(detail).context['user_vote'], self.no.pk)
+        self.send([self.ballot(self.voters[0], self.yes)])
+        self.assertEqual(voter.get(detail).context['user_vote'], self.yes.pk)
+
+    def test_reports_each_vote(self):
+        """Each vote gets its own status and only valid ones are saved."""
+        closed = create_question("Closed?", days_offset=-2, days_end=-1)
+        closed_choice = Choice.objects.create(question=closed,
+                                              choice_text="Late")
+        future = create_question("Future?", days_offset=1)
+        future_choice = Choice.objects.create(question=future,
+                                              choice_text="Early")
+        other = create_question("Other?", days_offset=-1)
+        other_choice = Choice.objects.create(question=other,
+                                             choice_text="Elsewhere")
+        response = self.send([
+            self.ballot(self.voters[0], self.yes),
+            self.ballot(self.voters[1], closed_choice, closed),
+            self.ballot(self.voters[1], future_choice, future),
+            self.ballot(self.voters[1], other_choice),
+            {'user': 12345, 'question': self.question.pk,
+             'choice': self.yes.pk},
+            {'user': str(self.voters[2].pk), 'question': self.question.pk},
+            "yes",
+        ])
+        self.assertEqual(
+            [item['status'] for item in response.json()['results']],
+            ['saved', 'not_open', 'not_open', 'invalid_choice',
+             'unknown_user', 'invalid', 'invalid'])
+        self.assertEqual(list(Vote.objects.values_list('user', 'choice')),
+                         [(self.voters[0].pk, self.yes.pk)])
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        """A batch is checked and saved in the same number of queries."""
+        self.send([])
+        with CaptureQueriesContext(connection) as one:
+            self.send([self.ballot(self.voters[0], self.yes)])
+        with CaptureQueriesContext(connection) as many:
+            self.send([self.ballot(voter, self.yes)
+                       for voter in self.voters[1:]] * 10)
+        self.assertEqual(len(one), len(many))
+
+    def test_needs_permission(self):
+        """Only users allowed to add votes may send them."""
+        self.client.logout()
+        self.assertEqual(self.send([]).status_code, 401)
+        self.client.force_login(self.voters[0])
+        self.assertEqual(self.send([]).status_code, 403)
+        self.assertEqual(self.send([self.ballot(self.voters[0],
+                                                self.yes)]).status_code, 403)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_rejects_bad_requests(self):
+        """Malformed bodies, other methods and huge batches are refused."""
+        url = reverse('polls:vote_batch')
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(url, "[1, 2]",
+                                          content_type='application/json')
+                         .status_code, 400)
+        self.assertEqual(self.client.post(url, "not json",
+                                          content_type='application/json')
+                         .status_code, 400)
+        with self.settings(POLLS_VOTE_BATCH_SIZE=2):
+            self.assertEqual(self.send([{}] * 3).status_code, 413)
@@ -0,0 +1,87 @@
+"""Tests of the denormalized per-choice vote counters."""
+from io import StringIO
+
+import django.test
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+from django.db import IntegrityError
+from django.urls import reverse
+
+from polls.models import Question, Choice, Vote
+
+
+class VoteCountTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="voter",
+                                             password="FatChance!")
+        self.question = Question.objects.create(question_text="Counted?")
+        self.choices = [Choice.objects.create(question=self.question,
+                                              choice_text=f"Choice {n}")
+                        for n in range(1, 4)]
+        self.client.login(username="voter", password="FatChance!")
+
+    def vote_for(self, choice):
+        """Submit a vote for a choice through the vote view."""
+        return self.client.post(
+            reverse('polls:vote', args=(self.question.id,)),
+            {"choice": choice.id})
+
+    def test_vote_increments_counter(self):
+        """A new vote adds one to the selected choice's counter."""
+        self.vote_for(self.choices[0])
+        self.choices[0].refresh_from_db()
+        self.assertEqual(self.choices[0].votes, 1)
+
+    def test_changing_vote_moves_counter(self):
+        """Changing a vote moves one count from the old choice to the new."""
+        self.vote_for(self.choices[0])
+        self.vote_for(self.choices[1])
+        self.vote_for(self.choices[1])
+        counts = [choice.vote_count for choice in
+                  Choice.objects.filter(question=self.question)
+                  .order_by('pk')]
+        self.assertEqual(counts, [0, 1, 0])
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_one_vote_per_question(self):
+        """The database rejects a second vote of a user for a question."""
+        Vote.objects.create(user=self.user, choice=self.choices[0])
+        with self.assertRaises(IntegrityError):
+            Vote.objects.create(user=self.user, choice=self.choices[1])
+
+    def test_record_upserts(self):
+        """Recording a vote reads the old vote once and upserts the new."""
+        Vote.objects.record(self.user, self.choices[0])
+        # savepoint, voter lock, select, upsert, two counter updates, rollup
+        # insert, select and update, release
+        with self.assertNumQueries(10):
+            Vote.objects.record(self.user, self.choices[1])
+        vote = Vote.objects.get()
+        self.assertEqual(vote.choice, self.choices[1])
+        self.assertEqual(vote.question, self.question)
+
+    def test_results_query_count_independent_of_choices(self):
+        """The results page does not run a query per choice."""
+        url = reverse('polls:results', args=(self.question.id,))
+        self.client.logout()
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        for n in range(4, 11):
+            Choice.objects.create(question=self.question,
+                                  choice_text=f"Choice {n}")
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+    def test_rebuild_command_fixes_counters(self):
+        """The rebuild command recounts counters from the Vote rows."""
+        Vote.objects.create(user=self.user, choice=self.choices[2])
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vote_counts', '--check',
+                         stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_vote_counts',
+                     stdout=StringIO(), stderr=StringIO())
+        self.choices[2].refresh_from_db()
+        self.assertEqual(self.choices[2].vote_count, 1)
+        call_command('rebuild_vote_counts', '--check', stdout=StringIO())
@@ -0,0 +1,67 @@
+"""Tests of the write-behind vote queue."""
+from unittest import mock
+
+import django.test
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+
+from polls.ingest import VoteQueue
+from polls.models import Question, Choice, Vote
+
+
+class VoteQueueTest(django.test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="voter",
+                                             password="FatChance!")
+        self.question = Question.objects.create(question_text="Queued?")
+        self.choices = [Choice.objects.create(question=self.question,
+                                              choice_text=f"Choice {n}")
+                        for n in range(1, 4)]
+        self.queue = VoteQueue(interval=60, batch_size=2, autostart=False)
+
+    def test_flush_keeps_last_choice(self):
+        """Only the last queued choice of a user for a question is saved."""
+        for choice in self.choices:
+            self.queue.submit(self.user.pk, self.question.pk, choice.pk)
+        self.assertEqual(len(self.queue), 1)
+        self.queue.flush()
+        vote = Vote.objects.get()
+        self.assertEqual(vote.choice, self.choices[2])
+        self.assertEqual(len(self.queue), 0)
+
+    def test_flush_in_batches(self):
+        """Votes of many users are written and counted."""
+        for n in range(5):
+            user = User.objects.create_user(username=f"user{n}")
+            self.queue.submit(user.pk, self.question.pk, self.choices[0].pk)
+        # three batches, each a savepoint, voter lock, select, insert,
+        # counter update, rollup insert, select and update, and savepoint
+        # release
+        with self.assertNumQueries(3 * 9):
+            self.queue.flush()
+        self.choices[0].refresh_from_db()
+        self.assertEqual(self.choices[0].vote_count, 5)
+
+    def test_flush_moves_existing_vote(self):
+        """A queued vote replaces the user's saved vote."""
+        Vote.objects.record(self.user, self.choices[0])
+        self.queue.submit(self.user.pk, self.question.pk, self.choices[1].pk)
+        self.queue.flush()
+        counts = list(Choice.objects.order_by('pk')
+                      .values_list('vote_count', flat=True))
+        self.assertEqual(counts, [0, 1, 0])
+
+    @override_settings(POLLS_VOTE_QUEUE=True)
+    def test_user_sees_own_queued_vote(self):
+        """The detail page shows a vote that is still in the queue."""
+        self.client.login(username="voter", password="FatChance!")
+        with mock.patch('polls.ingest._queue', self.queue):
+            self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                             {"choice": self.choices[1].id})
+            self.assertFalse(Vote.objects.exists())
+            response = self.client.get(reverse('polls:detail',
+                                               args=(self.question.id,)))
+        self.assertEqual(response.context["user_vote"], self.choices[1].id)
@@ -1,8 +1,15 @@
 import datetime
+import json
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase
 from django.utils import timezone
 from django.urls import reverse
-from .models import Question
+from .models import Question, Choice
+from .views import IndexView
 
 
 def create_question(question_text, days_offset, days_end=None):
@@ -96,7 +103,42 @@ class QuestionModelTests(TestCase):
         self.assertIs(question.can_vote(), False)
 
 
+class QuestionStatusTests(TestCase):
+    def test_is_open_matches_can_vote(self):
+        """
+        The function tests that the `is_open` annotation agrees with
+        `can_vote()` for open, closed and unpublished questions.
+        """
+        create_question("Open", -1)
+        create_question("Open until later", -1, 1)
+        create_question("Closed", -10, -1)
+        create_question("Unpublished", 2)
+        for question in Question.objects.with_status():
+            self.assertIs(question.is_open, question.can_vote(),
+                          question.question_text)
+
+    def test_next_boundary(self):
+        """
+        The function tests that the next boundary is the earliest future
+        publication or end date.
+        """
+        self.assertIsNone(Question.objects.next_boundary())
+        create_question("Closed", -10, -1)
+        self.assertIsNone(Question.objects.next_boundary())
+        closing = create_question("Closing", -1, 3)
+        self.assertEqual(Question.objects.next_boundary(), closing.end_date)
+        opening = create_question("Opening", 2)
+        self.assertEqual(Question.objects.next_boundary(), opening.pub_date)
+
+
 class QuestionIndexViewTests(TestCase):
+    def setUp(self):
+        """
+        The function empties the cache so no test sees a poll list cached
+        by another test.
+        """
+        cache.clear()
+
     def test_no_question(self):
         """
         The function tests if there are no questions available in the polls
@@ -155,6 +197,82 @@ class QuestionIndexViewTests(TestCase):
         self.assertQuerysetEqual(response.context['latest_question_list'],
                                  [question2, question1])
 
+    def test_question_list_is_cached(self):
+        """
+        The function tests that the question list is served from the cache
+        until a question is saved.
+        """
+        create_question(question_text="Past question.", days_offset=-30)
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('polls:index'))
+        create_question(question_text="New question.", days_offset=-1)
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "New question.")
+
+    def test_question_list_sees_other_processes(self):
+        """
+        The function tests that a question saved without this process
+        knowing, as by another worker, shows up once the cached version
+        is older than ``POLLS_INDEX_MAX_AGE``.
+        """
+        create_question(question_text="Past question.", days_offset=-30)
+        self.client.get(reverse('polls:index'))
+        Question.objects.bulk_create([Question(
+            question_text="Elsewhere.",
+            pub_date=timezone.now() - datetime.timedelta(days=1))])
+        response = self.client.get(reverse('polls:index'))
+        self.assertNotContains(response, "Elsewhere.")
+        later = time.time() + settings.POLLS_INDEX_MAX_AGE + 1
+        with mock.patch('time.time', return_value=later):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "Elsewhere.")
+
+    def test_keyset_pages(self):
+        """
+        The function tests that following the cursor pages through every
+        question exactly once, including questions published together.
+        """
+        same_time = timezone.now() - datetime.timedelta(days=1)
+        questions = [Question.objects.create(question_text=f"Q{n}",
+                                             pub_date=same_time)
+                     for n in range(5)]
+        seen = []
+        url = reverse('polls:index')
+        with mock.patch.object(IndexView, 'page_size', 2):
+            while url:
+                response = self.client.get(url)
+                seen.extend(response.context['latest_question_list'])
+                cursor = response.context['page'].next_cursor
+                url = cursor and f"{reverse('polls:index')}?before={cursor}"
+        self.assertEqual(seen, questions[::-1])
+
+    def test_bad_cursor_shows_first_page(self):
+        """
+        The function tests that a malformed cursor shows the first page.
+        """
+        question = create_question(question_text="Past question.",
+                                   days_offset=-30)
+        response = self.client.get(reverse('polls:index'),
+                                   {"before": "not-a-cursor"})
+        self.assertQuerysetEqual(response.context['latest_question_list'],
+                                 [question])
+
+    def test_export_streams_json_lines(self):
+        """
+        The function tests that the export lists published questions as
+        JSON lines.
+        """
+        question = create_question(question_text="Past question.",
+                                   days_offset=-30)
+        create_question(question_text="Future question.", days_offset=30)
+        response = self.client.get(reverse('polls:export'))
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual(row["id"], question.id)
+        self.assertIs(row["is_open"], True)
+
 
 class QuestionDetailViewTests(TestCase):
     def test_future_question(self):
@@ -178,6 +296,30 @@ class QuestionDetailViewTests(TestCase):
         response = self.client.get(url)
         self.assertContains(response, past_question.question_text)
 
+    def test_unknown_question(self):
+        """
+        The function tests that an unknown question redirects to the index.
+        """
+        response = self.client.get(reverse('polls:detail', args=(99,)))
+        self.assertRedirects(response, reverse('polls:index'))
+
+    def test_query_count(self):
+        """
+        The function tests that the detail page of an open question is
+        served from the registry of open polls without queries, once the
+        registry has been reloaded after the question changed.
+        """
+        question = create_question(question_text='Past Question.',
+                                   days_offset=-5)
+        url = reverse('polls:detail', args=(question.id,))
+        for n in range(5):
+            question.choice_set.create(choice_text=f"Choice {n}")
+            with self.assertNumQueries(3):
+                response = self.client.get(url)
+            self.assertContains(response, f"Choice {n}")
+            with self.assertNumQueries(0):
+                self.client.get(url)
+
 
 class QuestionResultsViewTests(TestCase):
     def test_results_view_for_past_question(self):
@@ -201,3 +343,108 @@ class QuestionResultsViewTests(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'polls/results.html')
+
+
+class QuestionResultsJsonTests(TestCase):
+    def test_results_json_counts(self):
+        """
+        The function tests that the JSON results list every choice with its
+        votes and the total.
+        """
+        question = create_question("Past Question", days_offset=-5)
+        first = question.choice_set.create(choice_text="First", vote_count=2)
+        second = question.choice_set.create(choice_text="Second",
+                                            vote_count=3)
+        url = reverse('polls:results_json', args=(question.id,))
+        response = self.client.get(url)
+        self.assertEqual(response.json(), {
+            "id": question.id,
+            "question_text": "Past Question",
+            "choices": [{"id": first.id, "text": "First", "votes": 2},
+                        {"id": second.id, "text": "Second", "votes": 3}],
+            "total": 5,
+        })
+
+    def test_results_json_query_count(self):
+        """
+        The function tests that the JSON results take the same number of
+        queries however many choices the question has.
+        """
+        question = create_question("Past Question", days_offset=-5)
+        url = reverse('polls:results_json', args=(question.id,))
+        for n in range(20):
+            question.choice_set.create(choice_text=f"Choice {n}")
+            with self.assertNumQueries(2):
+                self.client.get(url)
+
+    def test_results_json_missing_question(self):
+        """
+        The function tests that the JSON results of an unknown question
+        return 404.
+        """
+        response = self.client.get(reverse('polls:results_json', args=(99,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        """
+        The function empties the cache so no test sees a poll list cached
+        by another test.
+        """
+        cache.clear()
+
+    def test_results_not_modified(self):
+        """
+        The function tests that the results page answers 304 until a vote
+        changes the counts.
+        """
+        question = create_question("Past Question", days_offset=-5)
+        choice = question.choice_set.create(choice_text="Choice")
+        url = reverse('polls:results', args=(question.id,))
+        etag = self.client.get(url).headers['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Choice.objects.adjust_vote_counts({choice.id: 1})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_results_json_not_modified(self):
+        """
+        The function tests that the JSON results answer 304 when nothing
+        changed.
+        """
+        question = create_question("Past Question", days_offset=-5)
+        url = reverse('polls:results_json', args=(question.id,))
+        etag = self.client.get(url).headers['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_index_not_modified(self):
+        """
+        The function tests that the index answers 304 with Last-Modified
+        until a question is added.
+        """
+        create_question("Past question.", days_offset=-30)
+        last_modified = self.client.get(
+            reverse('polls:index')).headers['Last-Modified']
+        response = self.client.get(reverse('polls:index'),
+                                   HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        create_question("New question.", days_offset=-1)
+        response = self.client.get(reverse('polls:index'),
+                                   HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_pending_messages_are_rendered(self):
+        """
+        The function tests that a page is rendered, not 304, while a flash
+        message is waiting to be shown.
+        """
+        question = create_question("Past Question", days_offset=-5)
+        url = reverse('polls:results', args=(question.id,))
+        etag = self.client.get(url).headers['ETag']
+        self.client.get(reverse('polls:detail', args=(99,)))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Poll with ID 99 is not found.")
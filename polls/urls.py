@@ -1,11 +1,33 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
+
+
+def build_urlpatterns(pages):
+    """
+    The function builds the polls URLs with the page views taken from a
+    module, so the sync and async views can be mounted the same way.
+
+    :param pages: `polls.views` or `polls.async_views`.
+    :return: a list of URL patterns.
+    """
+    return [
+        path('', pages.IndexView.as_view(), name='index'),
+        path('export.jsonl', views.question_export, name='export'),
+        path('stats/', views.instrumentation_stats, name='stats'),
+        path('<int:pk>/', pages.DetailView.as_view(), name='detail'),
+        path('<int:pk>/results/', pages.ResultsView.as_view(),
+             name='results'),
+        path('<int:pk>/results.json', views.results_json,
+             name='results_json'),
+        path('<int:pk>/results/stream/', views.results_stream,
+             name='results_stream'),
+        path('<int:question_id>/vote/', pages.vote, name='vote'),
+        path('votes/', views.vote_batch, name='vote_batch'),
+    ]
+
 
 app_name = 'polls'
-urlpatterns = [
-    path('', views.IndexView.as_view(), name='index'),
-    path('<int:pk>/', views.DetailView.as_view(), name='detail'),
-    path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
-    path('<int:question_id>/vote/', views.vote, name='vote'),
-]
+urlpatterns = build_urlpatterns(
+    async_views if settings.POLLS_ASYNC_VIEWS else views)
@@ -0,0 +1,85 @@
+"""A per-user map of question id to choice id, kept in the session.
+
+It is filled from the `Vote` table when the user logs in and updated by
+`vote()`, so pages that show the user's own vote do not have to query
+the vote table. Votes saved for a user outside their session, as by
+`vote_batch`, are flagged with `forget_user_votes`, and the map is filled
+again on the user's next request. The flag is kept in ``CACHES``, so with
+a cache that is not shared, other processes only see it from their own
+votes.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Vote
+
+SESSION_KEY = 'polls_user_votes'
+WARMED_KEY = 'polls_user_votes_at'
+
+
+def _changed_key(user_id):
+    return f'polls:user-votes-changed:{user_id}'
+
+
+def warm_user_votes(request, user):
+    """
+    The function loads all votes of a user into the session.
+    :param request: The request whose session is filled.
+    :param user: The user who has just logged in.
+    """
+    # Read from the primary: a map loaded from a lagging replica would be
+    # stamped as fresh and kept until the next flag.
+    votes = Vote.objects.using(DEFAULT_DB_ALIAS).filter(user=user)
+    request.session[WARMED_KEY] = time.time()
+    request.session[SESSION_KEY] = {
+        str(question_id): choice_id
+        for question_id, choice_id in votes.values_list('question_id',
+                                                        'choice_id')
+    }
+
+
+def get_user_votes(request):
+    """
+    The function returns the current user's votes, loading them if the
+    session does not have them yet.
+    :return: a dict of question id (as a string) to choice id.
+    """
+    if not request.user.is_authenticated:
+        return {}
+    changed = cache.get(_changed_key(request.user.pk))
+    if (SESSION_KEY not in request.session
+            or (changed is not None
+                and changed >= request.session.get(WARMED_KEY, 0))):
+        warm_user_votes(request, request.user)
+    return request.session[SESSION_KEY]
+
+
+def get_user_vote(request, question_id):
+    """
+    The function returns the choice the current user voted for.
+    :return: a choice id, or None if the user has not voted.
+    """
+    return get_user_votes(request).get(str(question_id))
+
+
+def remember_vote(request, question_id, choice_id):
+    """
+    The function records a new vote of the current user in the session.
+    """
+    votes = get_user_votes(request)
+    votes[str(question_id)] = choice_id
+    request.session.modified = True
+
+
+def forget_user_votes(user_ids):
+    """
+    The function marks the session vote maps of users as out of date, after
+    votes were saved for them outside their own sessions.
+    :param user_ids: The ids of the users.
+    """
+    now = time.time()
+    cache.set_many({_changed_key(user_id): now for user_id in user_ids},
+                   settings.SESSION_COOKIE_AGE)
@@ -1,24 +1,184 @@
+import asyncio
+import datetime
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponseRedirect, Http404
+from django.template.loader import render_to_string
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (HttpResponseRedirect, Http404, JsonResponse,
+                         StreamingHttpResponse)
 from django.urls import reverse
+from django.views.decorators.http import require_POST
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.views import generic
 from django.utils import timezone
 from django.contrib import messages
-from .models import Question, Choice, Vote
+from django.conf import settings
+from .broadcast import broadcaster
+from .caching import (index_last_modified, index_version,
+                      question_list_context, render_question_list)
+from .ingest import get_vote_queue
+from .instrumentation import timings
+from .models import Question, Vote
+from .pagination import KeysetPage, SinglePage
+from .registry import open_polls
+from .user_votes import (forget_user_votes, get_user_vote, get_user_votes,
+                         remember_vote)
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+
+
+def make_etag(*parts):
+    """
+    The function builds an ETag from everything a page depends on.
+    :param parts: JSON-serializable values.
+    :return: a quoted ETag string.
+    """
+    data = json.dumps(parts, cls=DjangoJSONEncoder, sort_keys=True)
+    return quote_etag(hashlib.md5(data.encode(),
+                                  usedforsecurity=False).hexdigest())
+
+
+def cache_frozen(response, public=False):
+    """
+    The function lets clients keep the results of a finalized question for
+    ``POLLS_SNAPSHOT_MAX_AGE`` seconds, as they can no longer change.
+
+    :param response: A response showing frozen results.
+    :param public: Whether shared caches may keep it too.
+    :return: the response.
+    """
+    if settings.POLLS_SNAPSHOT_MAX_AGE:
+        visibility = {'public': True} if public else {'private': True}
+        patch_cache_control(response, max_age=settings.POLLS_SNAPSHOT_MAX_AGE,
+                            **visibility)
+    return response
+
+
+def conditional_get(request, render_page, etag, last_modified=None,
+                    shows_messages=True):
+    """
+    The function answers 304 Not Modified if the client already has the
+    page, otherwise renders it and adds the validators.
+
+    :param request: The request object represents the HTTP request.
+    :param render_page: A callable that renders the full response.
+    :param etag: The ETag of the page.
+    :param last_modified: When the page last changed, if known.
+    :param shows_messages: Whether the page shows flash messages. Such a
+        page is always rendered while messages are waiting to be shown.
+    :return: an HTTP response.
+    """
+    timestamp = last_modified and int(last_modified.timestamp())
+    if not (shows_messages and len(messages.get_messages(request))):
+        response = get_conditional_response(request, etag=etag,
+                                            last_modified=timestamp)
+        if response is not None:
+            return response
+    response = render_page()
+    response.headers['ETag'] = etag
+    if timestamp:
+        response.headers['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def most_active(now):
+    """
+    The function returns the published questions with the most votes in
+    the last ``POLLS_ACTIVITY_HOURS`` hours, counted from the hourly
+    rollups.
+    :param now: The time the list is built for.
+    :return: a queryset of questions annotated with `is_open`.
+    """
+    since = now - datetime.timedelta(hours=settings.POLLS_ACTIVITY_HOURS)
+    return Question.objects.published(now).with_status(now).most_active(since)
 
 
 class IndexView(generic.ListView):
+    """View for the list of published questions, newest first.
+
+    The list is paged with a keyset cursor on (pub_date, id) passed as
+    ``?before=``, so every page costs the same. With ``?order=active`` it
+    shows the most active questions instead.
+    """
     template_name = 'polls/index.html'
     context_object_name = 'latest_question_list'
+    page_size = 20
+
+    def get(self, request, *args, **kwargs):
+        """
+        Answer 304 Not Modified if no question has opened, closed or
+        changed and the user's own votes are the same.
+        """
+        self.now = timezone.now()
+        if request.GET.get('order') == 'active':
+            # The ranking changes with every vote, so it is not cached.
+            return super().get(request, *args, **kwargs)
+        last_modified = index_last_modified(self.now)
+        etag = make_etag(index_version(), last_modified,
+                         request.GET.get('before'),
+                         request.user.get_username(),
+                         sorted(get_user_votes(request)))
+        return conditional_get(
+            request, lambda: super(IndexView, self).get(request, *args,
+                                                        **kwargs),
+            etag, last_modified)
 
     def get_queryset(self):
         """
-        Return the last five published questions (not including those set
-        to be published in the future).
+        Return the published questions (not including those set to be
+        published in the future), each annotated with whether it is open
+        for voting.
         """
-        return Question.objects.filter(pub_date__lte=timezone.now()).order_by(
-            '-pub_date')
+        return Question.objects.published(self.now).with_status(self.now)
+
+    def get_context_data(self, **kwargs):
+        """
+        Add the current page of questions and its rendered list, taken
+        from the cache when no question has opened or closed since it was
+        rendered.
+        """
+        if self.request.GET.get('order') == 'active':
+            page = SinglePage(list(most_active(self.now)[:self.page_size]))
+            context = super().get_context_data(object_list=page.object_list,
+                                               **kwargs)
+            context['order'] = 'active'
+            context['question_list'] = render_to_string(
+                'polls/question_list.html', question_list_context(page))
+        else:
+            cursor = self.request.GET.get('before')
+            page = KeysetPage(self.object_list, self.page_size, cursor)
+            context = super().get_context_data(
+                object_list=page.queryset[:self.page_size], **kwargs)
+            context['question_list'] = render_question_list(page, self.now,
+                                                             cursor)
+        context['page'] = page
+        context['user_votes'] = list(get_user_votes(self.request))
+        return context
+
+
+def question_export(request):
+    """
+    The function streams every published question as JSON lines, reading
+    the table in chunks so memory use stays flat.
+
+    :param request: The request object represents the HTTP request.
+    :return: a streaming response with one JSON object per line.
+    """
+    now = timezone.now()
+    rows = (Question.objects.published(now).with_status(now)
+            .order_by('-pub_date', '-pk')
+            .values('id', 'question_text', 'pub_date', 'end_date',
+                    'is_open')
+            .iterator(chunk_size=2000))
+    lines = (json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in rows)
+    return StreamingHttpResponse(lines, content_type='application/x-ndjson')
 
 
 class DetailView(generic.DetailView):
@@ -36,35 +196,36 @@ class DetailView(generic.DetailView):
 
         :return: Queryset of published questions
         """
-        return Question.objects.filter(pub_date__lte=timezone.now())
+        return Question.objects.published()
 
     def get(self, request, *args, **kwargs):
         """Retrieve the specified question and display its details.
 
+        An open question and its choices come from the `open_polls`
+        registry without a query. Only other questions are looked up,
+        to tell apart those that are closed from those that do not exist.
+
         :param request: The incoming request from the user.
         :param args: Additional arguments.
         :param kwargs: Keyword arguments, typically containing the question's
         primary key.
         :return: The rendered template showing the question's details.
         """
-        try:
-            self.object = get_object_or_404(Question, pk=kwargs["pk"])
-        except Http404:
+        self.object = open_polls.get(kwargs['pk'])
+        if self.object is None:
+            try:
+                question = self.get_object()
+            except Http404:
+                messages.error(request,
+                               f"Poll with ID {kwargs['pk']} is not found.")
+                return redirect("polls:index")
             messages.error(request,
-                           f"Poll with ID {kwargs['pk']} is not found.")
-            return redirect("polls:index")
-        try:
-            user_vote = self.object.choice_set.filter(
-                vote__user=request.user).last()
-        except TypeError:
-            user_vote = None
-        context = self.get_context_data(object=self.object,
-                                        user_vote=user_vote)
-        if not self.object.can_vote():
-            messages.error(request,
-                           f"The poll '{self.object}' "
+                           f"The poll '{question}' "
                            f"has concluded and voting is closed.")
             return redirect("polls:index")
+        context = self.get_context_data(
+            object=self.object, choices=self.object.open_choices,
+            user_vote=get_user_vote(request, self.object.pk))
         return self.render_to_response(context)
 
 
@@ -79,52 +240,239 @@ class ResultsView(generic.DetailView):
         """
         The `get` function retrieves a question object based on its
         primary key, checks if it is a future question, and displays
-        an error message if it is not available for voting.
+        an error message if it is not available for voting. It answers
+        304 Not Modified if the votes have not changed since the client
+        last fetched the page.
 
         :param request: The `request` parameter represents the HTTP request.
         :return: The code is returning a rendered HTML template with the
         question and a boolean value.
         """
-        question = get_object_or_404(Question, pk=kwargs["pk"])
+        question = get_object_or_404(
+            Question.objects.select_related('resultsnapshot'),
+            pk=kwargs["pk"])
+        frozen = question.frozen_results()
+        results = frozen or question.results()
         is_future_question = not question.can_vote()
-        if is_future_question:
-            messages.error(request, "That poll is not available to vote.")
-        return render(request, self.template_name, {"question": question,
-                                                    "is_future_question":
-                                                        is_future_question})
+
+        def render_page():
+            if is_future_question:
+                messages.error(request, "That poll is not available to vote.")
+            return render(request, self.template_name,
+                          {"question": question,
+                           "results": results,
+                           "is_future_question": is_future_question})
+
+        etag = make_etag(results, is_future_question,
+                         request.user.get_username())
+        response = conditional_get(request, render_page, etag)
+        return cache_frozen(response) if frozen else response
+
+
+def results_json(request, pk):
+    """
+    The function returns the vote counts of a question as JSON, so the
+    results chart and dashboards can poll them without rendering a page.
+
+    :param request: The request object represents the HTTP request.
+    :param pk: The primary key of the question.
+    :return: a JSON response with each choice's votes and the total.
+    """
+    question = get_object_or_404(
+        Question.objects.select_related('resultsnapshot'), pk=pk)
+    frozen = question.frozen_results()
+    results = frozen or question.results()
+    response = conditional_get(request, lambda: JsonResponse(results),
+                               make_etag(results), shows_messages=False)
+    return cache_frozen(response, public=True) if frozen else response
+
+
+async def results_stream(request, pk):
+    """
+    The function streams a question's results as Server-Sent Events,
+    sending the current counts first and then every change as `vote()`
+    records it.
+
+    A stream ends after ``POLLS_STREAM_LIFETIME`` seconds, or when the
+    poll closes, and the browser then reconnects, so streams left by
+    closed tabs do not pile up. Closed polls cannot change, so they get
+    their results once and a ``close`` event. Under WSGI a stream would
+    tie up a worker, so only the current counts are sent and the browser
+    reconnects after a few seconds instead.
+
+    :param request: The request object represents the HTTP request.
+    :param pk: The primary key of the question.
+    :return: a streaming response of `text/event-stream`.
+    """
+    question = await (Question.objects.select_related('resultsnapshot')
+                      .filter(pk=pk).afirst())
+    if question is None:
+        raise Http404("No question matches the given query.")
+    frozen = question.frozen_results()
+    results = frozen or await sync_to_async(question.results)()
+    lifetime = settings.POLLS_STREAM_LIFETIME
+    if question.end_date is not None:
+        lifetime = min(lifetime, (question.end_date
+                                  - timezone.now()).total_seconds())
+    closed = frozen is not None or lifetime < 0
+
+    def event(data):
+        return f"data: {json.dumps(data)}\n\n"
+
+    async def events():
+        queue = broadcaster.subscribe(question.pk)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + lifetime
+        try:
+            yield "retry: 5000\n"
+            yield event(results)
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    yield event(await asyncio.wait_for(
+                        queue.get(),
+                        min(settings.POLLS_STREAM_KEEPALIVE, remaining)))
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            broadcaster.unsubscribe(question.pk, queue)
+
+    if closed:
+        stream = ["retry: 5000\n", event(results),
+                  "event: close\ndata: closed\n\n"]
+    elif isinstance(request, ASGIRequest):
+        stream = events()
+    else:
+        stream = ["retry: 5000\n", event(results)]
+    return StreamingHttpResponse(stream, content_type='text/event-stream',
+                                 headers={'Cache-Control': 'no-cache',
+                                          'X-Accel-Buffering': 'no'})
 
 
 @login_required
 def vote(request, question_id):
     """
     The function allows users to vote on a specific question and updates the
-    vote count for the selected choice.
+    vote count for the selected choice. The question and the choice are
+    checked against the `open_polls` registry, without a query.
 
     :param request: The request object represents the HTTP request.
     :param question_id: The `question_id` parameter is the unique identifier.
     :return: an HTTP redirect response to the 'polls:results'.
     """
-    question = get_object_or_404(Question, pk=question_id)
-    if not question.can_vote():
+    question = open_polls.get(question_id)
+    if question is None:
+        get_object_or_404(Question, pk=question_id)
         return redirect("login")  # Redirect to the login page if not logged in
-    try:
-        selected_choice = question.choice_set.get(pk=request.POST['choice'])
-    except (KeyError, Choice.DoesNotExist):
+    selected_choice = open_polls.choice(question, request.POST.get('choice'))
+    if selected_choice is None:
         messages.error(request, "Please select a choice!")
         return redirect("polls:detail", pk=question.id)
-    this_user = request.user
-    """if the user has a vote for this question, update the vote for
-    selected_choice save it"""
-    try:
-        current_vote = Vote.objects.get(user=this_user,
-                                        choice__question=question)
-        current_vote.choice = selected_choice
-    except Vote.DoesNotExist:
-        current_vote = Vote(user=this_user, choice=selected_choice)
-    current_vote.save()
+    """if the user has a vote for this question, move it to the
+    selected_choice, otherwise create a new one"""
+    if settings.POLLS_VOTE_QUEUE:
+        get_vote_queue().submit(request.user.pk, question.pk,
+                                selected_choice.pk)
+    else:
+        Vote.objects.record(request.user, selected_choice)
+    remember_vote(request, question.pk, selected_choice.pk)
 
     # Add a success message after saving the vote
     messages.success(request, f'Your vote for '
                               f'{selected_choice.choice_text} has been saved.')
     return HttpResponseRedirect(reverse(
         'polls:results', args=(question.id,)))
+
+
+BALLOT_FIELDS = ('user', 'question', 'choice')
+
+
+def _ballot(item):
+    """
+    The function reads one vote of a batch.
+    :return: a (user id, question id, choice id) tuple, or None if the
+        item is malformed.
+    """
+    if not isinstance(item, dict):
+        return None
+    ballot = tuple(item.get(field) for field in BALLOT_FIELDS)
+    if not all(type(value) is int for value in ballot):
+        return None
+    return ballot
+
+
+@require_POST
+def vote_batch(request):
+    """
+    The function records many votes at once for clients that relay votes
+    on behalf of their users, such as kiosk and clicker gateways.
+
+    The body is ``{"votes": [{"user": 1, "question": 2, "choice": 3}]}``.
+    The votes are checked against the `open_polls` registry, like in
+    `vote()`, and the valid ones are saved together in one transaction.
+    The sender needs the ``polls.add_vote`` permission.
+
+    :param request: The request object represents the HTTP request.
+    :return: a JSON response with the status of each vote, in order.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': "Log in to send votes."}, status=401)
+    if not request.user.has_perm('polls.add_vote'):
+        return JsonResponse({'error': "You may not send votes for others."},
+                            status=403)
+    try:
+        items = json.loads(request.body)['votes']
+    except (ValueError, KeyError, TypeError):
+        items = None
+    if not isinstance(items, list):
+        return JsonResponse({'error': 'Send {"votes": [...]} as JSON.'},
+                            status=400)
+    if len(items) > settings.POLLS_VOTE_BATCH_SIZE:
+        return JsonResponse(
+            {'error': f"Send at most {settings.POLLS_VOTE_BATCH_SIZE} "
+                      f"votes at once."}, status=413)
+
+    ballots = [_ballot(item) for item in items]
+    valid = [ballot for ballot in ballots if ballot is not None]
+    open_questions = open_polls.questions()
+    users = set(User.objects.filter(
+        pk__in={user_id for user_id, _, _ in valid}, is_active=True)
+        .values_list('pk', flat=True))
+
+    accepted, statuses = [], []
+    for ballot in ballots:
+        if ballot is None:
+            status = 'invalid'
+        elif ballot[0] not in users:
+            status = 'unknown_user'
+        elif ballot[1] not in open_questions:
+            status = 'not_open'
+        elif ballot[2] not in open_questions[ballot[1]].choices_by_id:
+            status = 'invalid_choice'
+        else:
+            status = 'queued' if settings.POLLS_VOTE_QUEUE else 'saved'
+            accepted.append(ballot)
+        statuses.append({'status': status})
+    if settings.POLLS_VOTE_QUEUE:
+        queue = get_vote_queue()
+        for ballot in accepted:
+            queue.submit(*ballot)
+    else:
+        Vote.objects.record_many(accepted)
+    forget_user_votes({user_id for user_id, _, _ in accepted})
+    return JsonResponse({'accepted': len(accepted), 'results': statuses})
+
+
+@staff_member_required
+def instrumentation_stats(request):
+    """
+    The function shows the timings of recent requests to each URL name, as
+    recorded by `InstrumentationMiddleware`.
+
+    :param request: The request object represents the HTTP request.
+    :return: the rendered stats page.
+    """
+    return render(request, 'polls/stats.html', {
+        'enabled': settings.POLLS_INSTRUMENTATION,
+        'window': settings.POLLS_INSTRUMENTATION_WINDOW,
+        'summaries': timings.summaries(),
+    })